@@ -0,0 +1,190 @@
+"""Latency and API round-trips of the slash commands against fake Drive, Firestore and Discord.
+
+Builds a synthetic pack (every sprite in both the permanent and temporary
+trees, half of them past the to-do cutoff, one credit per sprite), then calls
+the /upload, /upload-batch, /fetch, /to-do and /credits callbacks one at a time, twice: "cold"
+is before warm-up has finished (live Drive crawls and Firestore queries),
+"warm" is with the Drive index, to-do tracker and credits view loaded.
+Round-trips are per call. Review polls and fingerprints go to throwaway
+databases and polls are never tallied.
+
+Usage: python benchmarks/bench_commands.py [sprites] [calls_per_command] [sprites_per_subfolder]
+"""
+import asyncio
+import io
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from PIL import Image
+
+import main
+from fake_discord import FakeDiscord
+from fake_google import FakeDrive, FakeFirestore
+from image_cache import UpscaleCache
+from hash_index import HashIndex
+from review_scheduler import ReviewScheduler
+
+FOLDERS = list(main.FOLDER_MAPPING["permanent"])
+CREATORS = 200
+BATCH_SIZE = 20
+# Every call gets its own user and channel so Discord pacing never shows up in the latency
+destinations = itertools.count()
+
+
+def sprite_png(seed):
+    rng = random.Random(seed)
+    image = Image.new("RGBA", (16, 16))
+    image.putdata([tuple(rng.randrange(256) for _ in range(4)) for _ in range(16 * 16)])
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def build_pack(sprites, per_subfolder):
+    drive = FakeDrive()
+    db = FakeFirestore()
+    drive.add_folder("archive", folder_id=main.ARCHIVE_FOLDER_ID)
+    content = sprite_png(0)
+    subfolders = {}
+    for kind in ("temporary", "permanent"):
+        for folder, root_id in main.FOLDER_MAPPING[kind].items():
+            drive.add_folder(f"{kind}/{folder}", folder_id=root_id)
+            subfolders[kind, folder] = root_id
+    names = {folder: [] for folder in FOLDERS}
+    credits = db.collection("sprites")
+    for i in range(sprites):
+        folder = FOLDERS[i % len(FOLDERS)]
+        name = f"sprite_{i}.png"
+        # Half untouched since long before the cutoff, half redone after it
+        modified_time = "2024-01-01T00:00:00.000Z" if i % 2 else "2025-06-01T00:00:00.000Z"
+        for kind in ("temporary", "permanent"):
+            if len(names[folder]) % per_subfolder == 0:
+                root_id = main.FOLDER_MAPPING[kind][folder]
+                subfolders[kind, folder] = drive.add_folder(f"sub{len(names[folder]) // per_subfolder}", root_id)["id"]
+            drive.add(name, subfolders[kind, folder], content, modified_time=modified_time)
+        names[folder].append(name)
+        creator = i % CREATORS
+        credits.docs[name] = {
+            "creator_id": creator,
+            "creator_name": f"creator{creator}",
+            "sprite_name": name,
+            "folder": folder,
+        }
+    return drive, db, names
+
+
+def install(drive, db, discord, directory):
+    main.authenticate_drive = lambda: drive
+    main.authenticate_db = lambda: db
+    main.read_attachment = discord.read_attachment
+    main.bot.get_channel = discord.channel
+    main.bot.get_user = lambda user_id: discord.users.get(user_id)
+    main.review_scheduler = ReviewScheduler(os.path.join(directory, "reviews.db"), main.tally_review, main.drop_review)
+    main.hash_index = HashIndex(os.path.join(directory, "hashes.db"))
+    for creator in range(CREATORS):
+        discord.user(creator, f"creator{creator}")
+
+
+def reset(warm, drive, db):
+    main.archive_folder_checked = False
+    main.upscale_cache = UpscaleCache(max_bytes=64 * 1024 * 1024)
+    main.creator_names.clear()
+    main.drive_index.ready = False
+    main.todo_tracker.ready = False
+    main.credits_view.stop()
+    main.credits_view.ready.clear()
+    if warm:
+        main.drive_index.build(drive)
+        main.todo_tracker.load()
+        main.credits_view.start(db)
+
+
+def make_calls(names, discord, rng):
+    def context():
+        i = next(destinations)
+        return discord.context(10 ** 6 + i, channel_id=10 ** 7 + i)
+
+    def upload():
+        folder = rng.choice(FOLDERS)
+        name = rng.choice(names[folder])
+        attachment = discord.attachment(name, sprite_png(rng.random()))
+        return main.upload_sprite.callback(context(), folder, attachment)
+
+    def upload_batch():
+        folder = rng.choice(FOLDERS)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            for name in rng.sample(names[folder], BATCH_SIZE):
+                zf.writestr(name, sprite_png(rng.random()))
+        attachment = discord.attachment("batch.zip", archive.getvalue(), "application/zip")
+        return main.upload_batch.callback(context(), folder, attachment)
+
+    def fetch():
+        folder = rng.choice(FOLDERS)
+        return main.fetch_sprite.callback(context(), folder, rng.choice(names[folder]))
+
+    def to_do():
+        return main.to_do.callback(context(), rng.choice(FOLDERS))
+
+    def credits():
+        kind = rng.randrange(3)
+        if kind == 0:
+            return main.credits.callback(context(), name=f"creator{rng.randrange(CREATORS)}")
+        if kind == 1:
+            folder = rng.choice(FOLDERS)
+            return main.credits.callback(context(), sprite_name=rng.choice(names[folder]))
+        return main.credits.callback(context(), folder=rng.choice(FOLDERS), name=f"creator{rng.randrange(CREATORS)}")
+
+    return {"upload": upload, "batch": upload_batch, "fetch": fetch, "to-do": to_do, "credits": credits}
+
+
+async def measure(command, calls, drive, db, discord):
+    latencies = []
+    trips = {"drive": 0, "firestore": 0, "discord": 0}
+    for _ in range(calls):
+        before = drive.round_trips, db.round_trips, discord.round_trips
+        started = time.perf_counter()
+        await command()
+        latencies.append((time.perf_counter() - started) * 1000)
+        trips["drive"] += drive.round_trips - before[0]
+        trips["firestore"] += db.round_trips - before[1]
+        trips["discord"] += discord.round_trips - before[2]
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return statistics.median(latencies), p99, {api: count / calls for api, count in trips.items()}
+
+
+async def run(sprites, calls, per_subfolder):
+    started = time.perf_counter()
+    drive, db, names = build_pack(sprites, per_subfolder)
+    print(f"pack: {sprites} sprites in {len(drive.files_by_id)} Drive entries, built in {time.perf_counter() - started:.1f}s")
+    print(f"{calls} calls per command, latency in ms, round-trips per call")
+    print(f"{'mode':<5} {'command':<8} {'p50':>9} {'p99':>9} {'drive':>8} {'firestore':>9} {'discord':>8}")
+    discord = FakeDiscord()
+    with tempfile.TemporaryDirectory() as directory:
+        install(drive, db, discord, directory)
+        for mode in ("cold", "warm"):
+            before = drive.round_trips + db.round_trips
+            reset(mode == "warm", drive, db)
+            if mode == "warm":
+                print(f"      warm-up: {drive.round_trips + db.round_trips - before} round-trips")
+            commands = make_calls(names, discord, random.Random(mode))
+            for name, command in commands.items():
+                p50, p99, trips = await measure(command, calls, drive, db, discord)
+                print(f"{mode:<5} {name:<8} {p50:>9.2f} {p99:>9.2f} {trips['drive']:>8.1f} {trips['firestore']:>9.1f} {trips['discord']:>8.1f}")
+    main.credits_view.stop()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(run(*(args + [10000, 50, 100][len(args):])))
@@ -0,0 +1,65 @@
+"""Cold-start import cost of main.py, measured with `python -X importtime`.
+
+Prints the total and the slowest top-level packages. With --record FILE the
+result is appended as a CSV row (timestamp, git revision, total ms) so cold
+start can be tracked over time.
+Usage: python benchmarks/bench_importtime.py [--runs N] [--record FILE]
+"""
+import argparse
+import csv
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure():
+    env = dict(os.environ, DISCORD_TOKEN=os.environ.get("DISCORD_TOKEN", "benchmark"), PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    total = 0
+    packages = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        if module == "main":
+            total = int(cumulative_us)
+        packages[module.split(".")[0]] += int(self_us)
+    return total / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--record")
+    args = parser.parse_args()
+
+    totals = []
+    packages = None
+    for _ in range(args.runs):
+        total, packages = measure()
+        totals.append(total)
+    median = statistics.median(totals)
+    print(f"import main: median {median:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print("slowest packages (self time, last run):")
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {package:<30} {us / 1000:8.1f} ms")
+
+    if args.record:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        with open(args.record, "a", newline="") as f:
+            csv.writer(f).writerow([time.strftime("%Y-%m-%dT%H:%M:%S"), revision, f"{median:.1f}"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Full and incremental mirror syncs and resource-pack builds against the fake Drive.
+
+Usage: python benchmarks/bench_mirror.py [sprites] [changed_percent]
+"""
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from download_manager import fetch_media
+from drive_index import DriveIndex
+from fake_google import FakeDrive
+from mirror import Mirror
+
+FOLDERS = {folder: f"root_{folder}" for folder in ("item", "block", "particle", "misc", "entities", "gui")}
+PER_SUBFOLDER = 100
+
+
+def build_drive(sprites):
+    drive = FakeDrive()
+    parents = {}
+    for folder, root_id in FOLDERS.items():
+        drive.add_folder(folder, folder_id=root_id)
+    names = []
+    for i in range(sprites):
+        folder = list(FOLDERS)[i % len(FOLDERS)]
+        count = i // len(FOLDERS)
+        if count % PER_SUBFOLDER == 0:
+            parents[folder] = drive.add_folder(f"sub{count // PER_SUBFOLDER}", FOLDERS[folder])["id"]
+        names.append(drive.add(f"sprite_{i}.png", parents[folder], f"sprite {i} v1".encode()))
+    return drive, names
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<34} {time.perf_counter() - started:7.2f}s  {result}")
+    return result
+
+
+def run(sprites, changed_percent):
+    drive, files = build_drive(sprites)
+    index = DriveIndex(FOLDERS.values())
+    download = lambda file: fetch_media(drive, file["id"], file.get("size"))
+    with tempfile.TemporaryDirectory() as directory:
+        pack_path = os.path.join(directory, "pack.zip")
+        mirror = Mirror(os.path.join(directory, "mirror"), FOLDERS)
+
+        drive.round_trips = 0
+        index.build(drive)
+        timed("full sync", mirror.sync, index, download)
+        print(f"{'':<34} {drive.round_trips} Drive round-trips, index build included")
+        timed("pack build (cold)", mirror.build_pack, pack_path)
+        timed("pack build (nothing changed)", mirror.build_pack, pack_path)
+
+        # Some sprites redone, a few new ones added
+        changed = files[:max(1, sprites * changed_percent // 100)]
+        for file in changed:
+            drive.add(file["name"], file["parents"][0], f"{file['name']} v2".encode(), file_id=file["id"])
+        drive.round_trips = 0
+        index.sync(drive)
+        timed(f"delta sync ({len(changed)} changed)", mirror.sync, index, download)
+        print(f"{'':<34} {drive.round_trips} Drive round-trips")
+        timed("pack build (changed)", mirror.build_pack, pack_path)
+
+        for i in range(10):
+            drive.add(f"new_{i}.png", files[i]["parents"][0], f"new {i}".encode())
+        index.sync(drive)
+        timed("delta sync (10 added)", mirror.sync, index, download)
+        timed("pack build (added)", mirror.build_pack, pack_path)
+
+        with zipfile.ZipFile(pack_path) as pack:
+            bad = pack.testzip()
+            print(f"pack: {len(pack.namelist())} entries, {os.path.getsize(pack_path)} bytes, corrupt entry: {bad}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*(args + [10000, 1][len(args):]))
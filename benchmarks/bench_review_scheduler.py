@@ -0,0 +1,58 @@
+"""Throughput of the review scheduler with thousands of pending submissions.
+
+Usage: python benchmarks/bench_review_scheduler.py [pending]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from review_scheduler import ReviewScheduler, PendingReview
+
+
+async def main(pending):
+    tallied = 0
+
+    async def tally(review):
+        nonlocal tallied
+        tallied += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reviews.db")
+        scheduler = ReviewScheduler(path, tally)
+        now = time.time()
+
+        started = time.perf_counter()
+        for i in range(pending):
+            scheduler.add(PendingReview(
+                message_id=i,
+                channel_id=1,
+                filename=f"sprite_{i}.png",
+                folder="item",
+                author_id=i % 50,
+                author_name=f"user{i % 50}",
+                # Half are already due, the rest are spread over the next day
+                deadline=now - 1 if i % 2 else now + 86400 * i / pending
+            ))
+        enqueue = time.perf_counter() - started
+
+        # Reopen to simulate a restart
+        scheduler = ReviewScheduler(path, tally)
+        started = time.perf_counter()
+        task = asyncio.create_task(scheduler.run())
+        while tallied < pending // 2:
+            await asyncio.sleep(0)
+        drain = time.perf_counter() - started
+        task.cancel()
+
+        print(f"pending={pending}")
+        print(f"enqueue: {enqueue:.3f}s ({pending / enqueue:.0f}/s)")
+        print(f"resume + tally {tallied} due: {drain:.3f}s ({tallied / drain:.0f}/s)")
+        print(f"left pending: {scheduler.count()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,93 @@
+"""Drive round-trips per submission, old archive-and-replace flow vs the batched one.
+
+Runs against the in-process fake Drive in fake_google.py.
+Usage: python benchmarks/bench_upload_roundtrips.py [subfolders] [sprites_per_folder] [submissions]
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main
+from fake_google import FakeDrive, FOLDER_MIME_TYPE
+
+
+def build_tree(subfolders, sprites_per_folder):
+    drive = FakeDrive()
+    drive.add_folder("archive", folder_id=main.ARCHIVE_FOLDER_ID)
+    names = []
+    for kind in ("temporary", "permanent"):
+        root_id = main.FOLDER_MAPPING[kind]["item"]
+        drive.add_folder(f"{kind}/item", folder_id=root_id)
+        for i in range(subfolders):
+            folder = drive.add_folder(f"sub{i}", root_id)
+            for j in range(sprites_per_folder):
+                name = f"sprite_{i}_{j}.png"
+                drive.add(name, folder["id"], b"old")
+                if kind == "permanent":
+                    names.append(name)
+    return drive, names
+
+
+def legacy_search(service, parent_folder_id, file_name):
+    # Depth-first walk as recursive_search did it before the index and crawler
+    query = f"'{parent_folder_id}' in parents and name = '{file_name}' and trashed = false"
+    page_token = None
+    while True:
+        response = service.files().list(q=query, pageToken=page_token).execute()
+        yield from response.get("files", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    subfolders = service.files().list(
+        q=f"'{parent_folder_id}' in parents and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+    ).execute().get("files", [])
+    for subfolder in subfolders:
+        yield from legacy_search(service, subfolder["id"], file_name)
+
+
+def legacy_upload(service, file_name, folder_id, file_data):
+    service.files().get(fileId=main.ARCHIVE_FOLDER_ID).execute()
+    found_files = list(legacy_search(service, folder_id, file_name))
+    for file in found_files:
+        service.files().update(
+            fileId=file["id"], addParents=main.ARCHIVE_FOLDER_ID, removeParents=file["parents"][0]
+        ).execute()
+    if found_files:
+        from googleapiclient.http import MediaIoBaseUpload
+        media = MediaIoBaseUpload(file_data, mimetype="image/png")
+        service.files().create(body={"name": file_name, "parents": [folder_id]}, media_body=media).execute()
+
+
+def run(upload, subfolders, sprites_per_folder, submissions, use_index):
+    drive, names = build_tree(subfolders, sprites_per_folder)
+    main.archive_folder_checked = False
+    main.drive_index.ready = False
+    startup = 0
+    if use_index:
+        main.drive_index.build(drive)
+        startup = drive.round_trips
+    drive.round_trips = 0
+    for name in names[:submissions]:
+        # Temporary upload on submission, then the permanent one on approval
+        upload(drive, name, main.FOLDER_MAPPING["temporary"]["item"], io.BytesIO(b"new"))
+        upload(drive, name, main.FOLDER_MAPPING["permanent"]["item"], io.BytesIO(b"new"))
+    return startup, drive.round_trips / submissions
+
+
+def main_(subfolders, sprites_per_folder, submissions):
+    print(f"tree: {subfolders} subfolders x {sprites_per_folder} sprites per root, {submissions} submissions")
+    _, before = run(legacy_upload, subfolders, sprites_per_folder, submissions, use_index=False)
+    _, cold = run(main.upload_to_drive, subfolders, sprites_per_folder, submissions, use_index=False)
+    startup, after = run(main.upload_to_drive, subfolders, sprites_per_folder, submissions, use_index=True)
+    print(f"before (sequential, tree walk):   {before:.1f} round-trips per submission")
+    print(f"after, index cold (live search):  {cold:.1f} round-trips per submission")
+    print(f"after, index warm:                {after:.1f} round-trips per submission (+{startup} once to build the index)")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main_(*(args + [50, 20, 50][len(args):]))
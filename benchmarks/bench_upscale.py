@@ -0,0 +1,63 @@
+"""Compare the NumPy upscaler against the old Pillow resize + default PNG path.
+
+Usage: python benchmarks/bench_upscale.py [factor]
+"""
+import io
+import os
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upscaler
+
+SIZES = [16, 32, 64, 128, 256, 512]
+
+
+def make_sprite(size):
+    # Sprite-like content: a small palette of colours in blocky regions with some transparency
+    rng = np.random.default_rng(size)
+    palette = rng.integers(0, 256, (12, 4), dtype=np.uint8)
+    palette[0, 3] = 0
+    blocks = rng.integers(0, len(palette), (max(size // 4, 1), max(size // 4, 1)))
+    indices = upscaler.upscale_array(blocks, 4)[:size, :size]
+    noise = rng.random((size, size)) < 0.2
+    indices[noise] = rng.integers(0, len(palette), noise.sum())
+    return Image.fromarray(palette[indices], "RGBA")
+
+
+def pillow_path(img, factor):
+    upscaled_img = img.resize((img.width * factor, img.height * factor), Image.NEAREST)
+    data = io.BytesIO()
+    upscaled_img.save(data, format="PNG")
+    return data
+
+
+def numpy_path(img, factor, encoder):
+    return upscaler.encode_png(upscaler.upscale(img, factor, max_side=1 << 16), encoder)
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main(factor):
+    print(f"factor={factor}")
+    print(f"{'size':>5} {'pillow ms':>10} {'numpy fast ms':>14} {'numpy resize ms':>16} {'archival ms':>12} {'pillow KB':>10} {'fast KB':>8}")
+    for size in SIZES:
+        img = make_sprite(size)
+        number = max(1, 2048 // size)
+        pillow = bench(lambda: pillow_path(img, factor), number)
+        fast = bench(lambda: numpy_path(img, factor, "fast"), number)
+        resize = bench(lambda: upscaler.upscale(img, factor, max_side=1 << 16), number)
+        archival = bench(lambda: numpy_path(img, factor, "archival"), max(1, number // 4))
+        pillow_kb = len(pillow_path(img, factor).getvalue()) / 1024
+        fast_kb = len(numpy_path(img, factor, "fast").getvalue()) / 1024
+        print(f"{size:>5} {pillow:>10.2f} {fast:>14.2f} {resize:>16.2f} {archival:>12.2f} {pillow_kb:>10.1f} {fast_kb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
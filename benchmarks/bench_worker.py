@@ -0,0 +1,74 @@
+"""Throughput of CPU-heavy jobs on the blocking thread pool versus worker processes.
+
+Renders contact sheets (the /upload-batch preview) through the shared job
+queue with 1..N worker processes, and on the gateway's own thread pool.
+
+Usage: python benchmarks/bench_worker.py [jobs] [max_processes]
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+import preview
+from executor import run_blocking
+from worker import JobQueue, start_workers
+
+PAIRS_PER_SHEET = 16
+
+
+def sprite(seed, size=32):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 4), dtype=np.uint8)
+    data = io.BytesIO()
+    Image.fromarray(pixels, "RGBA").save(data, format="PNG")
+    return data.getvalue()
+
+
+def make_pairs(job):
+    return [(f"sprite_{job}_{i}.png", sprite(job * 100 + i), sprite(job * 100 + i + 50)) for i in range(PAIRS_PER_SHEET)]
+
+
+async def run_threads(jobs):
+    started = time.perf_counter()
+    await asyncio.gather(*(run_blocking("image", preview.contact_sheet, pairs) for pairs in jobs))
+    return time.perf_counter() - started
+
+
+async def run_workers(queue, jobs):
+    # One throwaway job first so worker start-up isn't counted
+    await queue.submit("contact_sheet", jobs[0][:1])
+    started = time.perf_counter()
+    await asyncio.gather(*(queue.submit("contact_sheet", pairs) for pairs in jobs))
+    return time.perf_counter() - started
+
+
+async def main(count, max_processes):
+    jobs = [make_pairs(job) for job in range(count)]
+    elapsed = await run_threads(jobs)
+    print(f"{'thread pool':<16} {elapsed:7.2f}s  {count / elapsed:7.1f} sheets/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.db")
+        queue = JobQueue(path)
+        processes = 1
+        while processes <= max_processes:
+            workers = start_workers(path, processes)
+            try:
+                elapsed = await run_workers(queue, jobs)
+            finally:
+                for process in workers:
+                    process.terminate()
+                    process.wait()
+            print(f"{processes:>2} processes     {elapsed:7.2f}s  {count / elapsed:7.1f} sheets/s")
+            processes *= 2
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [64, os.cpu_count() or 1][len(args):])))
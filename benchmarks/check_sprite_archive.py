@@ -0,0 +1,37 @@
+"""Reads a one-sprite zip the way /upload-batch does, from a SpooledTemporaryFile.
+
+Run it on the Python version the Dockerfile ships (3.10), where the spooled
+file has no seekable() and zipfile used to fail on it.
+
+Usage: python benchmarks/check_sprite_archive.py
+"""
+import io
+import os
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprite_archive import PNG_SIGNATURE, read_sprite_archive
+
+
+def spooled_zip(members, max_size):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    file_data = tempfile.SpooledTemporaryFile(max_size=max_size)
+    file_data.write(archive.getvalue())
+    file_data.seek(0)
+    return file_data
+
+
+if __name__ == "__main__":
+    sprite = PNG_SIGNATURE + b"sprite"
+    # Kept in memory, and rolled over to disk
+    for max_size in (1024 * 1024, 16):
+        with spooled_zip({"sprite.png": sprite}, max_size) as file_data:
+            sprites, rejected = read_sprite_archive(file_data)
+        assert [(s.name, s.data) for s in sprites] == [("sprite.png", sprite)] and not rejected, (sprites, rejected)
+    print(f"Python {sys.version.split()[0]}: read_sprite_archive OK on SpooledTemporaryFile")
@@ -0,0 +1,118 @@
+"""In-process stand-ins for the Discord objects the slash commands touch.
+
+Every REST call the bot would make (sends, edits, deletes, attachment
+downloads) counts as one round-trip on the shared FakeDiscord.
+"""
+import io
+import itertools
+import threading
+
+
+class FakeDiscord:
+    def __init__(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.cdn = {}  # attachment url -> content
+        self.channels = {}
+        self.users = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def count(self, files=None):
+        with self.lock:
+            self.round_trips += 1
+            for file in files or []:
+                self.bytes_sent += len(file.file.getbuffer()) if isinstance(file.file, io.BytesIO) else 0
+
+    def next_id(self):
+        return next(self._ids)
+
+    def channel(self, channel_id):
+        channel_id = int(channel_id)
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(self, channel_id)
+        return self.channels[channel_id]
+
+    def user(self, user_id, global_name=None):
+        if user_id not in self.users:
+            self.users[user_id] = FakeUser(self, user_id, global_name or f"user{user_id}")
+        return self.users[user_id]
+
+    def attachment(self, filename, content, content_type="image/png"):
+        url = f"https://cdn.fake/attachments/{self.next_id()}/{filename}"
+        self.cdn[url] = content
+        return FakeAttachment(filename, url, content_type, len(content))
+
+    def context(self, user_id, channel_id=1):
+        return FakeContext(self, self.user(user_id), self.channel(channel_id))
+
+    async def read_attachment(self, url):
+        """Replacement for main.read_attachment that serves from the fake CDN."""
+        import hashlib
+        import tempfile
+
+        self.count()
+        content = self.cdn[url]
+        file_data = tempfile.SpooledTemporaryFile()
+        file_data.write(content)
+        file_data.seek(0)
+        return file_data, hashlib.sha256(content).hexdigest()
+
+
+class FakeMessage:
+    def __init__(self, discord, channel_id, content=None, files=None, poll=None):
+        self.discord = discord
+        self.id = discord.next_id()
+        self.channel_id = channel_id
+        self.content = content
+        self.files = files or []
+        self.poll = poll
+
+
+class FakeChannel:
+    def __init__(self, discord, channel_id):
+        self.discord = discord
+        self.id = channel_id
+        self.messages = []
+
+    async def send(self, content=None, files=None, poll=None, **kwargs):
+        self.discord.count(files)
+        message = FakeMessage(self.discord, self.id, content, files, poll)
+        self.messages.append(message)
+        return message
+
+
+class FakeUser(FakeChannel):
+    def __init__(self, discord, user_id, global_name):
+        super().__init__(discord, user_id)
+        self.global_name = global_name
+
+
+class FakeAttachment:
+    def __init__(self, filename, url, content_type, size):
+        self.filename = filename
+        self.url = url
+        self.content_type = content_type
+        self.size = size
+
+
+class FakeContext:
+    """Enough of SlashContext for the command callbacks."""
+
+    def __init__(self, discord, author, channel):
+        self.discord = discord
+        self.author = author
+        self.channel = channel
+        self.channel_id = channel.id
+        self.responses = []
+
+    async def send(self, content=None, files=None, **kwargs):
+        message = await self.channel.send(content, files=files, **kwargs)
+        self.responses.append(message)
+        return message
+
+    async def edit(self, message=None, content=None, **kwargs):
+        self.discord.count()
+
+    async def delete(self, message="@original"):
+        self.discord.count()
@@ -0,0 +1,347 @@
+"""In-process stand-ins for the subset of the Drive v3 and Firestore APIs the bot uses.
+
+Every `execute()` (and every batch, however many calls it carries) counts as
+one round-trip, as does every Firestore `set()` and `stream()`, so benchmarks
+can compare API traffic between code paths.
+"""
+import hashlib
+import itertools
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httplib2
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class FakeRequest:
+    def __init__(self, drive, func, uri=None):
+        self.drive = drive
+        self.func = func
+        # Enough for MediaIoBaseDownload, which drives requests through http/uri/headers
+        self.uri = uri
+        self.http = drive.http
+        self.headers = {}
+
+    def execute(self, http=None, num_retries=0):
+        self.drive.count()
+        return self.func()
+
+
+class FakeBatch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request, callback or self.callback, request_id or str(len(self.requests))))
+
+    def execute(self, http=None):
+        self.drive.count()
+        for request, callback, request_id in self.requests:
+            try:
+                response, exception = request.func(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeHttp:
+    """Serves ranged media downloads for MediaIoBaseDownload."""
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.drive.count()
+        content = self.drive.media[uri.rsplit("/", 1)[-1]]
+        start, end = 0, len(content) - 1
+        match = re.match(r"bytes=(\d+)-(\d+)", (headers or {}).get("range", ""))
+        if match:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(content) - 1)
+        response = httplib2.Response({
+            "status": 206,
+            "content-range": f"bytes {start}-{end}/{len(content)}",
+            "content-length": str(end - start + 1),
+        })
+        return response, content[start:end + 1]
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", pageSize=100, pageToken=None, **kwargs):
+        def run():
+            matches = self.drive.query(q)
+            offset = int(pageToken or 0)
+            page = matches[offset:offset + pageSize]
+            response = {"files": [self.drive.public(file) for file in page]}
+            if offset + pageSize < len(matches):
+                response["nextPageToken"] = str(offset + pageSize)
+            return response
+        return FakeRequest(self.drive, run)
+
+    def get(self, fileId, **kwargs):
+        return FakeRequest(self.drive, lambda: self.drive.public(self.drive.get(fileId)))
+
+    def get_media(self, fileId, **kwargs):
+        return FakeRequest(self.drive, lambda: self.drive.media[fileId], uri=f"fake://media/{fileId}")
+
+    def update(self, fileId, addParents=None, removeParents=None, body=None, **kwargs):
+        def run():
+            file = self.drive.get(fileId)
+            with self.drive.lock:
+                parents = [p for p in file["parents"] if p != removeParents]
+                if addParents:
+                    parents.append(addParents)
+                self.drive.move(file, parents)
+                file.update(body or {}, modifiedTime=_now())
+                self.drive.changed(file)
+            return self.drive.public(file)
+        return FakeRequest(self.drive, run)
+
+    def create(self, body, media_body=None, **kwargs):
+        def run():
+            content = b""
+            if media_body is not None:
+                content = media_body.getbytes(0, media_body.size())
+            return self.drive.public(self.drive.add(body["name"], body["parents"][0], content))
+        return FakeRequest(self.drive, run)
+
+    def copy(self, fileId, body, **kwargs):
+        def run():
+            source = self.drive.get(fileId)
+            file = self.drive.add(body.get("name", source["name"]), body["parents"][0], self.drive.media[fileId])
+            return self.drive.public(file)
+        return FakeRequest(self.drive, run)
+
+
+class FakeChanges:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(self.drive, lambda: {"startPageToken": str(len(self.drive.change_log))})
+
+    def list(self, pageToken, pageSize=100, **kwargs):
+        def run():
+            offset = int(pageToken)
+            page = self.drive.change_log[offset:offset + pageSize]
+            response = {"changes": page}
+            if offset + pageSize < len(self.drive.change_log):
+                response["nextPageToken"] = str(offset + pageSize)
+            else:
+                response["newStartPageToken"] = str(len(self.drive.change_log))
+            return response
+        return FakeRequest(self.drive, run)
+
+
+class FakeDrive:
+    """Drive service stand-in, usable anywhere `build("drive", "v3")` was."""
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.children = defaultdict(dict)  # parent id -> {file id: None}, in insertion order
+        self.media = {}
+        self.change_log = []
+        self.round_trips = 0
+        self.lock = threading.RLock()
+        self.http = FakeHttp(self)
+        self._ids = itertools.count(1)
+
+    def count(self):
+        with self.lock:
+            self.round_trips += 1
+
+    # Service surface
+    def files(self):
+        return FakeFiles(self)
+
+    def changes(self):
+        return FakeChanges(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    # Test helpers
+    def add_folder(self, name, parent_id=None, folder_id=None):
+        return self._insert(folder_id or f"folder{next(self._ids)}", name, parent_id, FOLDER_MIME_TYPE, None)
+
+    def add(self, name, parent_id, content=b"", file_id=None, modified_time=None):
+        return self._insert(file_id or f"file{next(self._ids)}", name, parent_id, "image/png", content, modified_time)
+
+    def _insert(self, file_id, name, parent_id, mime_type, content, modified_time=None):
+        file = {
+            "id": file_id,
+            "name": name,
+            "parents": [parent_id] if parent_id else [],
+            "mimeType": mime_type,
+            "modifiedTime": modified_time or _now(),
+            "trashed": False,
+        }
+        if content is not None:
+            file["md5Checksum"] = hashlib.md5(content).hexdigest()
+            file["size"] = str(len(content))
+        with self.lock:
+            self.files_by_id[file_id] = file
+            for parent_id in file["parents"]:
+                self.children[parent_id][file_id] = None
+            if content is not None:
+                self.media[file_id] = content
+            self.changed(file)
+        return file
+
+    def move(self, file, parents):
+        with self.lock:
+            for parent_id in file["parents"]:
+                self.children[parent_id].pop(file["id"], None)
+            for parent_id in parents:
+                self.children[parent_id][file["id"]] = None
+            file["parents"] = parents
+
+    def changed(self, file):
+        self.change_log.append({"fileId": file["id"], "removed": False, "file": self.public(file)})
+
+    def get(self, file_id):
+        try:
+            return self.files_by_id[file_id]
+        except KeyError:
+            raise LookupError(f"File not found: {file_id}")
+
+    def public(self, file):
+        return dict(file)
+
+    def query(self, q):
+        parents = set(re.findall(r"'([^']+)' in parents", q))
+        name = re.search(r"name = '((?:[^'\\]|\\.)*)'", q)
+        mime_type = re.search(r"mimeType = '([^']+)'", q)
+        # "(name = ... or mimeType = ...)" as used by the crawler; otherwise clauses are AND-ed
+        either = " or mimeType = " in q
+
+        def match(file):
+            name_ok = not name or file["name"] == name.group(1).replace("\\'", "'")
+            mime_ok = not mime_type or file["mimeType"] == mime_type.group(1)
+            return (name_ok or mime_ok) if either else (name_ok and mime_ok)
+
+        with self.lock:
+            if parents:
+                candidates = {}
+                for parent_id in parents:
+                    candidates.update(self.children[parent_id])
+                candidates = [self.files_by_id[file_id] for file_id in candidates]
+            else:
+                candidates = self.files_by_id.values()
+            return [file for file in candidates if match(file) and not file["trashed"]]
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeChange:
+    class Type:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, kind, document):
+        self.type = FakeChange.Type(kind)
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self.collection = collection
+        self.callback = callback
+
+    def unsubscribe(self):
+        self.collection.watches.remove(self)
+
+
+class FakeDocumentRef:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data):
+        self.collection.firestore.count()
+        self.collection.put(self.id, data)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=()):
+        self.collection = collection
+        self.filters = filters
+
+    def where(self, field, op, value):
+        assert op == "==", "only equality filters are faked"
+        return FakeQuery(self.collection, self.filters + ((field, value),))
+
+    def stream(self):
+        self.collection.firestore.count()
+        with self.collection.firestore.lock:
+            docs = list(self.collection.docs.items())
+        for doc_id, data in docs:
+            if all(data.get(field) == value for field, value in self.filters):
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, firestore):
+        super().__init__(self)
+        self.firestore = firestore
+        self.docs = {}
+        self.watches = []
+
+    def document(self, doc_id):
+        return FakeDocumentRef(self, doc_id)
+
+    def put(self, doc_id, data):
+        with self.firestore.lock:
+            kind = "MODIFIED" if doc_id in self.docs else "ADDED"
+            self.docs[doc_id] = dict(data)
+            watches = list(self.watches)
+        for watch in watches:
+            watch.callback([], [FakeChange(kind, FakeSnapshot(doc_id, data))], None)
+
+    def on_snapshot(self, callback):
+        # The initial snapshot is delivered inline, later writes as they happen
+        self.firestore.count()
+        watch = FakeWatch(self, callback)
+        with self.firestore.lock:
+            self.watches.append(watch)
+            changes = [FakeChange("ADDED", FakeSnapshot(doc_id, data)) for doc_id, data in self.docs.items()]
+        callback([], changes, None)
+        return watch
+
+
+class FakeFirestore:
+    """Firestore client stand-in, usable anywhere `firestore.Client()` was."""
+
+    def __init__(self):
+        self.collections = {}
+        self.round_trips = 0
+        self.lock = threading.RLock()
+
+    def count(self):
+        with self.lock:
+            self.round_trips += 1
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self)
+            return self.collections[name]
@@ -0,0 +1,61 @@
+"""Fire hundreds of overlapping uploads at the fake Drive and check every result.
+
+Each submission must archive exactly its own old file and end up with exactly
+one live copy, which the old module-level is_found flags could not guarantee.
+Usage: python benchmarks/stress_uploads.py [uploads]
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main
+from fake_google import FakeDrive
+
+
+async def stress(uploads):
+    drive = FakeDrive()
+    drive.add_folder("archive", folder_id=main.ARCHIVE_FOLDER_ID)
+    root_id = main.FOLDER_MAPPING["temporary"]["item"]
+    drive.add_folder("temporary/item", folder_id=root_id)
+    old_ids = {}
+    for i in range(uploads):
+        folder = drive.add_folder(f"sub{i % 20}", root_id) if i < 20 else None
+        parent_id = folder["id"] if folder else drive.query(f"'{root_id}' in parents")[i % 20]["id"]
+        old_ids[f"sprite_{i}.png"] = drive.add(f"sprite_{i}.png", parent_id, b"old")["id"]
+    main.authenticate_drive = lambda: drive
+    main.archive_folder_checked = False
+    main.drive_index.build(drive)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        main.upload_to_drive_async(name, root_id, io.BytesIO(name.encode()))
+        for name in old_ids
+    ))
+    elapsed = time.perf_counter() - started
+
+    failures = 0
+    for name, result in zip(old_ids, results):
+        live = [file for file in drive.query(f"'{root_id}' in parents") if file["name"] == name]
+        live += [file for file in drive.files_by_id.values()
+                 if file["name"] == name and main.drive_index.is_under(file["id"], root_id)]
+        live_ids = {file["id"] for file in live}
+        ok = (
+            result.found
+            and result.moved_ids == [old_ids[name]]
+            and result.file_id in drive.media
+            and drive.media[result.file_id] == name.encode()
+            and live_ids == {result.file_id}
+        )
+        failures += not ok
+    print(f"{uploads} overlapping uploads in {elapsed:.2f}s, {failures} inconsistent results")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(stress(int(sys.argv[1]) if len(sys.argv) > 1 else 300)) else 0)
@@ -0,0 +1,96 @@
+import datetime
+import logging
+import threading
+import time
+
+from metrics import InstrumentedHttp
+from rate_limit import RateLimitedHttp
+
+log = logging.getLogger(__name__)
+
+# The Google client libraries are imported where first needed, they dominate cold-start time
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+HTTP_TIMEOUT = 60
+
+
+class ClientRegistry:
+    """Builds the Drive and Firestore clients once and hands them out to every command.
+
+    httplib2 is not thread-safe, so each worker thread gets its own authorized
+    transport and Drive service, all built from one parsed discovery document
+    and sharing one set of credentials.
+    """
+
+    def __init__(self, drive_credentials_file="credentials.json", db_credentials_file="credentials_db.json"):
+        self.drive_credentials_file = drive_credentials_file
+        self.db_credentials_file = db_credentials_file
+        self.drive_credentials = None
+        self.db = None
+        self.timings = {}
+        self._drive_document = None
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._drive_document is not None:
+                return
+            from google.cloud import firestore
+            from google.oauth2.service_account import Credentials
+            from googleapiclient import discovery_cache
+
+            started = time.perf_counter()
+            self.drive_credentials = Credentials.from_service_account_file(self.drive_credentials_file, scopes=DRIVE_SCOPES)
+            # The discovery document ships with googleapiclient, no network fetch needed
+            drive_document = discovery_cache.get_static_doc("drive", "v3")
+            self.timings["drive_ms"] = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            self.db = firestore.Client(credentials=Credentials.from_service_account_file(self.db_credentials_file))
+            self.timings["firestore_ms"] = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            self.refresh_if_needed()
+            self.timings["token_ms"] = (time.perf_counter() - started) * 1000
+            # Only marked started once everything loaded, so a failed start is retried in full
+            self._drive_document = drive_document
+            log.info("Google clients ready: %s", ", ".join(f"{k}={v:.1f}" for k, v in self.timings.items()))
+
+    def refresh_if_needed(self):
+        # Refresh ahead of expiry so requests never stall on (or race over) an expired token
+        creds = self.drive_credentials
+        if creds.expiry and creds.expiry - datetime.datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+            return
+        with self._refresh_lock:
+            if creds.expiry and creds.expiry - datetime.datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+                return
+            import google_auth_httplib2
+            import httplib2
+
+            creds.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=HTTP_TIMEOUT)))
+
+    def drive(self):
+        self.start()
+        self.refresh_if_needed()
+        service = getattr(self._local, "drive", None)
+        if service is None:
+            import google_auth_httplib2
+            import httplib2
+            from googleapiclient.discovery import build_from_document
+
+            started = time.perf_counter()
+            # Every attempt is measured, retries and quota waits happen around it
+            authorized = google_auth_httplib2.AuthorizedHttp(self.drive_credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            http = RateLimitedHttp(InstrumentedHttp(authorized))
+            service = build_from_document(self._drive_document, http=http)
+            self._local.drive = service
+            self.timings["drive_thread_ms"] = (time.perf_counter() - started) * 1000
+        return service
+
+    def firestore(self):
+        # The Firestore client is gRPC based and safe to share between threads
+        self.start()
+        return self.db
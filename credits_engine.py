@@ -0,0 +1,128 @@
+import bisect
+import difflib
+import logging
+import threading
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+# Fields that get a secondary index; names are matched case-insensitively
+INDEXED_FIELDS = ("creator_id", "creator_name", "folder", "sprite_name")
+FUZZY_CUTOFF = 0.6
+FUZZY_LIMIT = 10
+
+
+def _index_key(field, value):
+    if value is None:
+        return None
+    return str(value).lower() if field in ("creator_name", "sprite_name") else str(value)
+
+
+class CreditsView:
+    """Local materialized view of the `sprites` collection.
+
+    Filled and kept live by a Firestore `on_snapshot` listener, so credit
+    queries are answered from memory through per-field secondary indexes.
+    """
+
+    def __init__(self):
+        self.docs = {}  # document id -> document data
+        self.ready = threading.Event()
+        self._indexes = {field: defaultdict(set) for field in INDEXED_FIELDS}
+        self._sorted_keys = {field: [] for field in INDEXED_FIELDS}
+        self._watch = None
+        self._lock = threading.RLock()
+
+    def start(self, db):
+        if self._watch is None:
+            self._watch = db.collection('sprites').on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, docs, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict())
+        if not self.ready.is_set():
+            log.info("Credits view loaded %d sprites", len(self.docs))
+            self.ready.set()
+
+    def upsert(self, doc_id, data):
+        with self._lock:
+            self.remove(doc_id)
+            self.docs[doc_id] = data
+            for field in INDEXED_FIELDS:
+                key = _index_key(field, data.get(field))
+                if key is None:
+                    continue
+                ids = self._indexes[field][key]
+                if not ids:
+                    bisect.insort(self._sorted_keys[field], key)
+                ids.add(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            data = self.docs.pop(doc_id, None)
+            if data is None:
+                return
+            for field in INDEXED_FIELDS:
+                key = _index_key(field, data.get(field))
+                ids = self._indexes[field].get(key)
+                if not ids:
+                    continue
+                ids.discard(doc_id)
+                if not ids:
+                    del self._indexes[field][key]
+                    keys = self._sorted_keys[field]
+                    del keys[bisect.bisect_left(keys, key)]
+
+    def _matching_keys(self, field, value, match):
+        key = _index_key(field, value)
+        keys = self._sorted_keys[field]
+        if match in ("exact", "auto") and key in self._indexes[field]:
+            return [key]
+        if match in ("prefix", "auto"):
+            start = bisect.bisect_left(keys, key)
+            end = bisect.bisect_left(keys, key + "\uffff")
+            if start < end or match == "prefix":
+                return keys[start:end]
+        if match in ("fuzzy", "auto"):
+            return difflib.get_close_matches(key, keys, n=FUZZY_LIMIT, cutoff=FUZZY_CUTOFF)
+        return []
+
+    def query(self, sprite_name=None, creator_name=None, creator_id=None, folder=None, match="auto"):
+        """Documents matching every given filter, sorted by sprite name.
+
+        `match` applies to the name filters: "exact", "prefix", "fuzzy", or
+        "auto" (exact, then prefix, then fuzzy). Folder and creator id are exact.
+        """
+        filters = {"sprite_name": sprite_name, "creator_name": creator_name, "creator_id": creator_id, "folder": folder}
+        with self._lock:
+            doc_ids = None
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                field_match = match if field in ("creator_name", "sprite_name") else "exact"
+                ids = set()
+                for key in self._matching_keys(field, value, field_match):
+                    ids |= self._indexes[field][key]
+                doc_ids = ids if doc_ids is None else doc_ids & ids
+                if not doc_ids:
+                    return []
+            if doc_ids is None:
+                doc_ids = self.docs.keys()
+            results = [self.docs[doc_id] for doc_id in doc_ids]
+        results.sort(key=lambda doc: (str(doc.get("sprite_name", "")).lower(), str(doc.get("folder", ""))))
+        return results
+
+
+def paginate(items, page, page_size):
+    """Slice out a 1-based page; returns the items and the total number of pages."""
+    pages = max(1, -(-len(items) // page_size))
+    page = min(max(page, 1), pages)
+    return items[(page - 1) * page_size:page * page_size], pages
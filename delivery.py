@@ -0,0 +1,74 @@
+import io
+
+from interactions import File
+
+from rate_limit import BULK, INTERACTIVE, TokenBucket, call_discord
+
+MAX_MESSAGE_LENGTH = 1900
+# Results longer than this go out as one text attachment instead of many messages
+ATTACHMENT_THRESHOLD = 4 * MAX_MESSAGE_LENGTH
+# Discord allows roughly 5 messages per 5 seconds per channel
+SEND_BURST = 5
+SEND_WINDOW = 5.0
+
+
+def iter_chunks(lines, max_length=MAX_MESSAGE_LENGTH):
+    """Pack lines into newline-joined chunks of at most max_length, in one linear pass."""
+    parts = []
+    size = 0
+    for line in lines:
+        if len(line) > max_length:
+            # A single over-long line is cut rather than overflowing a message
+            if parts:
+                yield "\n".join(parts)
+                parts, size = [], 0
+            while len(line) > max_length:
+                yield line[:max_length]
+                line = line[max_length:]
+        extra = len(line) + (1 if parts else 0)
+        if parts and size + extra > max_length:
+            yield "\n".join(parts)
+            parts, size, extra = [], 0, len(line)
+        parts.append(line)
+        size += extra
+    if parts:
+        yield "\n".join(parts)
+
+
+class SendQueue:
+    """Sends messages paced per destination and globally, interactive replies ahead of bulk output.
+
+    Sends that hit a 429 or a server error are retried with backoff, honoring Retry-After.
+    """
+
+    def __init__(self, burst=SEND_BURST, window=SEND_WINDOW):
+        self.burst = burst
+        self.window = window
+        self._buckets = {}  # destination -> TokenBucket
+
+    def _bucket(self, destination):
+        if destination not in self._buckets:
+            self._buckets[destination] = TokenBucket("discord_destination", self.burst / self.window, self.burst)
+        return self._buckets[destination]
+
+    async def send(self, destination, send, *args, priority=INTERACTIVE, **kwargs):
+        return await call_discord(self._bucket(destination), send, *args, priority=priority, **kwargs)
+
+
+send_queue = SendQueue()
+
+
+async def deliver(destination, send, lines, file_name, header=None, priority=BULK):
+    """Send result lines through `send`: as chunked messages, or as one text file when large.
+
+    `destination` identifies the channel or DM for pacing; `lines` may be any iterable.
+    """
+    lines = list(lines)
+    if sum(len(line) + 1 for line in lines) > ATTACHMENT_THRESHOLD:
+        text_file = File(file=io.BytesIO("\n".join(lines).encode()), file_name=file_name)
+        await send_queue.send(destination, send, header, files=[text_file], priority=priority)
+        return
+    if header:
+        await send_queue.send(destination, send, header, priority=priority)
+    for chunk in iter_chunks(lines):
+        await send_queue.send(destination, send, f"\n{chunk}", priority=priority)
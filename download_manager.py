@@ -0,0 +1,110 @@
+import asyncio
+import io
+import logging
+import os
+import time
+from collections import deque
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Sprites at or below this size (or of unknown size) are fetched in one request
+SMALL_DOWNLOAD_BYTES = 4 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CONCURRENCY = int(os.environ.get("DOWNLOAD_CONCURRENCY", "8"))
+
+metrics.registry.describe("download_seconds", "histogram", "Drive media download time, excluding the queue wait.")
+metrics.registry.describe("download_queue_seconds", "histogram", "Time Drive media downloads spent queued.")
+
+
+def fetch_media(service, file_id, size=None):
+    request = service.files().get_media(fileId=file_id)
+    if size is None or int(size) <= SMALL_DOWNLOAD_BYTES:
+        return request.execute()
+    from googleapiclient.http import MediaIoBaseDownload
+
+    file_data = io.BytesIO()
+    downloader = MediaIoBaseDownload(file_data, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+    return file_data.getvalue()
+
+
+class DownloadManager:
+    """Concurrent Drive downloads with identical in-flight requests coalesced.
+
+    `run(func, *args)` awaits `func(service, *args)` on the Drive worker pool,
+    which gives each thread its own pooled, authorized transport.
+    """
+
+    def __init__(self, run, max_concurrent=DOWNLOAD_CONCURRENCY):
+        self.run = run
+        self.max_concurrent = max_concurrent
+        self.queue_depth = 0
+        self.active = 0
+        self.downloads = 0
+        self.coalesced = 0
+        self.bytes = 0
+        self.recent = deque(maxlen=100)  # Per-download reports, newest last
+        self._in_flight = {}
+        self._semaphore = None
+
+    async def download(self, file):
+        """Return the content of `file` (metadata dict or file id) as bytes."""
+        file_id = file if isinstance(file, str) else file["id"]
+        size = None if isinstance(file, str) else file.get("size")
+        task = self._in_flight.get(file_id)
+        if task is not None:
+            # Single flight: wait on the download someone else already started
+            self.coalesced += 1
+        else:
+            # The download runs as its own task, so a cancelled requester doesn't cancel everyone waiting on it
+            task = asyncio.ensure_future(self._download(file_id, size))
+            self._in_flight[file_id] = task
+            task.add_done_callback(lambda done: self._finished(file_id, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, file_id, task):
+        if self._in_flight.get(file_id) is task:
+            del self._in_flight[file_id]
+        if not task.cancelled():
+            # Don't warn about an unretrieved exception if every requester went away
+            task.exception()
+
+    async def _download(self, file_id, size):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        queued = time.perf_counter()
+        self.queue_depth += 1
+        depth = self.queue_depth
+        waiting = True
+        try:
+            async with self._semaphore:
+                self.queue_depth -= 1
+                waiting = False
+                self.active += 1
+                started = time.perf_counter()
+                try:
+                    data = await self.run(fetch_media, file_id, size)
+                finally:
+                    self.active -= 1
+        finally:
+            if waiting:
+                self.queue_depth -= 1
+        self.downloads += 1
+        self.bytes += len(data)
+        report = {
+            "file_id": file_id,
+            "bytes": len(data),
+            "latency": time.perf_counter() - started,
+            "queued": started - queued,
+            "queue_depth": depth,
+        }
+        self.recent.append(report)
+        metrics.registry.observe("download_seconds", report["latency"])
+        metrics.registry.observe("download_queue_seconds", report["queued"])
+        log.debug("Downloaded %s: %d bytes in %.1f ms after %.1f ms queued (depth %d)", file_id, len(data),
+                  report["latency"] * 1000, report["queued"] * 1000, depth)
+        return data
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, parents, modifiedTime, mimeType, size, md5Checksum"
+CRAWL_FIELDS = f"nextPageToken, files({FILE_FIELDS})"
+PAGE_SIZE = 1000
+PARENTS_PER_QUERY = 20  # '<id>' in parents clauses OR-ed into one query
+CRAWL_WORKERS = int(os.environ.get("CRAWL_WORKERS", "8"))
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def children_query(folder_ids, file_name=None):
+    parents = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+    if file_name:
+        # Matches and subfolders come back together so the crawl can keep descending
+        return f"({parents}) and (name = '{escape(file_name)}' or mimeType = '{FOLDER_MIME_TYPE}') and trashed = false"
+    return f"({parents}) and trashed = false"
+
+
+def list_children(service, folder_ids, file_name=None):
+    """Every page of children of up to PARENTS_PER_QUERY folders, in one query."""
+    files = []
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=children_query(folder_ids, file_name),
+            spaces="drive",
+            fields=CRAWL_FIELDS,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            pageSize=PAGE_SIZE,
+            pageToken=page_token
+        ).execute()
+        files.extend(response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def _matches(file, file_name):
+    return file_name is None or file["name"] == file_name
+
+
+def crawl(service, root_id, file_name=None):
+    """Breadth-first walk under root_id, yielding every file (or every file named file_name)."""
+    frontier = [root_id]
+    seen = {root_id}
+    while frontier:
+        next_frontier = []
+        for start in range(0, len(frontier), PARENTS_PER_QUERY):
+            for file in list_children(service, frontier[start:start + PARENTS_PER_QUERY], file_name):
+                if file.get("mimeType") == FOLDER_MIME_TYPE and file["id"] not in seen:
+                    seen.add(file["id"])
+                    next_frontier.append(file["id"])
+                if _matches(file, file_name):
+                    yield file
+        frontier = next_frontier
+
+
+async def crawl_async(run, root_id, file_name=None, workers=CRAWL_WORKERS):
+    """Breadth-first walk that lists sibling folders concurrently.
+
+    `run(func, *args)` awaits a blocking Drive call as `func(service, *args)`
+    on the worker pool. Files are yielded as soon as their listing returns, so
+    callers after one match can stop early and the remaining listings are cancelled.
+    """
+    pending = [root_id]
+    seen = {root_id}
+    in_flight = set()
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < workers:
+                batch, pending = pending[:PARENTS_PER_QUERY], pending[PARENTS_PER_QUERY:]
+                in_flight.add(asyncio.ensure_future(run(list_children, batch, file_name)))
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for file in task.result():
+                    if file.get("mimeType") == FOLDER_MIME_TYPE and file["id"] not in seen:
+                        seen.add(file["id"])
+                        pending.append(file["id"])
+                    if _matches(file, file_name):
+                        yield file
+    finally:
+        for task in in_flight:
+            task.cancel()
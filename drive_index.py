@@ -0,0 +1,174 @@
+import logging
+import threading
+from collections import defaultdict
+
+from drive_crawler import FILE_FIELDS, FOLDER_MIME_TYPE, crawl
+
+log = logging.getLogger(__name__)
+
+
+class DriveIndex:
+    """In-memory map of every file under a set of Drive root folders.
+
+    Built once with `build()` and kept fresh with `sync()`, which replays the
+    Drive Changes API from the start page token saved at build time.
+    """
+
+    def __init__(self, root_ids):
+        self.root_ids = set(root_ids)
+        self.files = {}  # file id -> metadata
+        self.by_name = defaultdict(set)  # file name -> file ids
+        self.children = defaultdict(set)  # parent id -> child ids
+        self.start_page_token = None
+        self.ready = False
+        self.listeners = []  # called with (old, new) metadata whenever an entry changes
+        self._lock = threading.RLock()
+
+    def build(self, service):
+        # Grab the token first so changes made while crawling are replayed by the next sync
+        token = service.changes().getStartPageToken(supportsAllDrives=True).execute()
+        with self._lock:
+            self.files.clear()
+            self.by_name.clear()
+            self.children.clear()
+        for root_id in self.root_ids:
+            self._crawl(service, root_id)
+        with self._lock:
+            self.start_page_token = token.get("startPageToken")
+            self.ready = True
+        log.info("Drive index built: %d entries under %d roots", len(self.files), len(self.root_ids))
+
+    def _crawl(self, service, folder_id):
+        for file in crawl(service, folder_id):
+            self.add(file)
+
+    def sync(self, service):
+        """Apply all Drive changes since the saved start page token."""
+        if not self.ready:
+            return 0
+        applied = 0
+        page_token = self.start_page_token
+        while page_token:
+            response = service.changes().list(
+                pageToken=page_token,
+                spaces="drive",
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, trashed))",
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                pageSize=1000
+            ).execute()
+            for change in response.get("changes", []):
+                self._apply_change(service, change)
+                applied += 1
+            if "newStartPageToken" in response:
+                with self._lock:
+                    self.start_page_token = response["newStartPageToken"]
+            page_token = response.get("nextPageToken")
+        return applied
+
+    def _apply_change(self, service, change):
+        file = change.get("file")
+        if change.get("removed") or not file or file.get("trashed"):
+            self.remove(change["fileId"])
+            return
+        with self._lock:
+            tracked = any(p in self.root_ids or p in self.files for p in file.get("parents", []))
+            known = file["id"] in self.files
+        if not tracked:
+            # Moved out of the tree
+            self.remove(file["id"])
+            return
+        self.add(file)
+        if file.get("mimeType") == FOLDER_MIME_TYPE and not known:
+            # A folder moved into the tree brings its contents with it
+            self._crawl(service, file["id"])
+
+    def add(self, file):
+        file = {k: v for k, v in file.items() if k != "trashed"}
+        with self._lock:
+            old = self.files.get(file["id"])
+            if old:
+                self._unlink(old)
+            self.files[file["id"]] = file
+            self.by_name[file["name"]].add(file["id"])
+            for parent_id in file.get("parents", []):
+                self.children[parent_id].add(file["id"])
+            for listener in self.listeners:
+                listener(old, file)
+
+    def remove(self, file_id):
+        with self._lock:
+            file = self.files.pop(file_id, None)
+            if not file:
+                return
+            self._unlink(file)
+            # Drop everything that lived underneath a removed folder
+            for child_id in list(self.children.pop(file_id, ())):
+                self.remove(child_id)
+            for listener in self.listeners:
+                listener(file, None)
+
+    def _unlink(self, file):
+        ids = self.by_name.get(file["name"])
+        if ids:
+            ids.discard(file["id"])
+            if not ids:
+                del self.by_name[file["name"]]
+        for parent_id in file.get("parents", []):
+            siblings = self.children.get(parent_id)
+            if siblings:
+                siblings.discard(file["id"])
+
+    def is_under(self, file_id, folder_id):
+        seen = set()
+        with self._lock:
+            pending = list(self.files.get(file_id, {}).get("parents", []))
+            while pending:
+                parent_id = pending.pop()
+                if parent_id == folder_id:
+                    return True
+                if parent_id in seen:
+                    continue
+                seen.add(parent_id)
+                pending.extend(self.files.get(parent_id, {}).get("parents", []))
+        return False
+
+    def root_of(self, file_id):
+        seen = set()
+        with self._lock:
+            pending = list(self.files.get(file_id, {}).get("parents", []))
+            while pending:
+                parent_id = pending.pop()
+                if parent_id in self.root_ids:
+                    return parent_id
+                if parent_id in seen:
+                    continue
+                seen.add(parent_id)
+                pending.extend(self.files.get(parent_id, {}).get("parents", []))
+        return None
+
+    def find(self, name, folder_id=None):
+        with self._lock:
+            matches = [self.files[file_id] for file_id in self.by_name.get(name, ())]
+            if folder_id:
+                matches = [file for file in matches if self.is_under(file["id"], folder_id)]
+        return matches
+
+    def walk(self, folder_id, include_folders=False):
+        results = []
+        with self._lock:
+            pending = [folder_id]
+            seen = set()
+            while pending:
+                parent_id = pending.pop()
+                for child_id in self.children.get(parent_id, ()):
+                    if child_id in seen:
+                        continue
+                    seen.add(child_id)
+                    file = self.files[child_id]
+                    if file.get("mimeType") == FOLDER_MIME_TYPE:
+                        pending.append(child_id)
+                        if not include_folders:
+                            continue
+                    results.append(file)
+        return results
@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking Google API and Pillow calls run here so the gateway loop stays responsive
+MAX_WORKERS = int(os.environ.get("BLOCKING_WORKERS", "16"))
+SERVICE_LIMITS = {
+    "drive": int(os.environ.get("DRIVE_CONCURRENCY", "8")),
+    "firestore": int(os.environ.get("FIRESTORE_CONCURRENCY", "4")),
+    "image": int(os.environ.get("IMAGE_CONCURRENCY", "4")),
+    "jobs": 2,  # Worker queue reads and writes, serialized on one SQLite connection anyway
+}
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="blocking")
+_semaphores = {}
+
+
+def _semaphore(service):
+    # Created lazily so they bind to the loop the bot is running on
+    if service not in _semaphores:
+        _semaphores[service] = asyncio.Semaphore(SERVICE_LIMITS[service])
+    return _semaphores[service]
+
+
+async def run_blocking(service, func, *args, **kwargs):
+    """Run `func` on the shared pool, at most SERVICE_LIMITS[service] at a time.
+
+    It runs in a copy of the caller's context, run_in_executor doesn't carry
+    context variables (such as the command metrics attribute API calls to).
+    """
+    async with _semaphore(service):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown():
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,26 @@
+# Google Drive folder ids, shared by the bot and standalone tools such as mirror.py
+FOLDER_MAPPING = {
+    "temporary": {
+        "item": "1BQEyVG8ylKk7oAp8Jhz9M5gxtMhFO3a4",
+        "block": "18P3L5YvbgYGYVLadQTQBD-TeI0tm6YSC",
+        "particle": "1sXocLrUNiGZbJGzJld0IZGk-ftnvngwk",
+        "misc": "1bwf7tLbc0OFQXwxomH3nelpru6l7PQax",
+        "model": "1CofC0kIjF-NwKI6Q2ZBr2fOZ6j9ZJ5pc",
+        "painting": "1GIV8xibgHAX1Kv4OSwH3w1Vl5Js_4JM-",
+        "entities": "19l75hUh5PQX6cNO54-tkk7MTm0NAhjBy",
+        "gui": "1ujlruXhKbsROIdsGJjMEnH4GQ2OuAPQ5"
+    },
+    "permanent": {
+        "item": "1NolwQk9msuyexp584AbCWbkv7K-c3FPh",
+        "block": "1QFwm04ug7TKxgdlLlEOv4hV6Hl5By5HX",
+        "particle": "1w3pEEtapERgv1hGQAZKQQ8fI5StjFC8K",
+        "misc": "1j0BE7E2guJ3WPWXnTOA_vctjsNvt22yL",
+        "model": "16lncPCMlHXhQBMVzQvEkXX0-Jyl163fC",
+        "painting": "1b2c0QL7caM04smn2L7yKynEtWh4uylQ0",
+        "entities": "1VOD3d9PDmzw9czvRh2Lh95qEc2tc0mMx",
+        "gui": "13x2lDkeBr78326cxAxjboHsTtCrjCCba"
+    }
+}
+
+# New folder where the old files will be moved
+ARCHIVE_FOLDER_ID = "1W9Zw6bRhL3nS6gj4S23YBcIdizaWdesN"
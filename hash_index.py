@@ -0,0 +1,157 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+# dHash bits that may differ for two sprites to count as near-duplicates
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get("NEAR_DUPLICATE_DISTANCE", "4"))
+NEAR_DUPLICATE_LIMIT = 5
+
+SUBMISSION = "submission"  # Awaiting review, `ref` is the poll message id
+PERMANENT = "permanent"  # In a permanent folder
+
+
+@dataclass
+class Fingerprint:
+    sha256: str  # Exact bytes
+    md5: str  # Exact bytes, comparable with Drive's md5Checksum
+    pixels: str = None  # Decoded RGBA pixels, same for re-encodes of one image
+    dhash: int = None  # 64-bit difference hash, close for visually similar images
+
+
+@dataclass
+class HashMatch:
+    name: str
+    folder: str
+    kind: str
+    ref: str
+    md5: str
+    distance: int  # 0 for byte or pixel identical
+
+
+def fingerprint(data):
+    """Hash a sprite's bytes and, if it decodes, its pixels."""
+    import numpy as np
+    from PIL import Image
+
+    result = Fingerprint(hashlib.sha256(data).hexdigest(), hashlib.md5(data).hexdigest())
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGBA")
+    except Exception:
+        return result
+    pixels = np.array(img)
+    # Colour under fully transparent pixels is invisible, don't let it tell images apart
+    pixels[pixels[..., 3] == 0] = 0
+    result.pixels = hashlib.sha256(f"{img.width}x{img.height}".encode() + pixels.tobytes()).hexdigest()
+
+    flat = Image.alpha_composite(Image.new("RGBA", img.size, (0, 0, 0, 255)), Image.fromarray(pixels, "RGBA"))
+    gray = np.asarray(flat.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    result.dhash = int("".join("1" if bit else "0" for bit in bits), 2)
+    return result
+
+
+class HashIndex:
+    """SQLite-backed fingerprints of pending submissions and permanent sprites.
+
+    Exact lookups go through indexed sha256/md5/pixel columns; near-duplicate
+    search scans the dHashes, which are kept in memory.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    id INTEGER PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    md5 TEXT NOT NULL,
+                    pixels TEXT,
+                    dhash TEXT,
+                    name TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    ref TEXT,
+                    created REAL NOT NULL
+                )
+            """)
+            for column in ("sha256", "md5", "pixels", "ref"):
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS hashes_{column} ON hashes ({column})")
+            self._dhashes = {
+                row_id: int(dhash, 16)
+                for row_id, dhash in self._db.execute("SELECT id, dhash FROM hashes WHERE dhash IS NOT NULL")
+            }
+
+    def add(self, fp, name, folder, kind, ref=None):
+        dhash = None if fp.dhash is None else f"{fp.dhash:016x}"
+        with self._lock, self._db:
+            row_id = self._db.execute(
+                "INSERT INTO hashes (sha256, md5, pixels, dhash, name, folder, kind, ref, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fp.sha256, fp.md5, fp.pixels, dhash, name, folder, kind, None if ref is None else str(ref), time.time())
+            ).lastrowid
+            if fp.dhash is not None:
+                self._dhashes[row_id] = fp.dhash
+
+    def has_md5(self, md5, kind=PERMANENT):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM hashes WHERE md5 = ? AND kind = ? LIMIT 1", (md5, kind)).fetchone() is not None
+
+    def exact(self, fp):
+        """Rows with the same bytes or the same decoded pixels."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, folder, kind, ref, md5 FROM hashes WHERE sha256 = ? OR (pixels IS NOT NULL AND pixels = ?)",
+                (fp.sha256, fp.pixels)
+            ).fetchall()
+        return [HashMatch(*row, distance=0) for row in rows]
+
+    def near(self, fp, max_distance=NEAR_DUPLICATE_DISTANCE, limit=NEAR_DUPLICATE_LIMIT):
+        """Closest rows by dHash, excluding pixel-identical ones."""
+        if fp.dhash is None:
+            return []
+        with self._lock:
+            close = sorted(
+                (distance, row_id) for row_id, dhash in self._dhashes.items()
+                if (distance := (dhash ^ fp.dhash).bit_count()) <= max_distance
+            )
+            matches = []
+            for distance, row_id in close:
+                row = self._db.execute(
+                    "SELECT name, folder, kind, ref, md5, sha256, pixels FROM hashes WHERE id = ?", (row_id,)
+                ).fetchone()
+                if row[5] == fp.sha256 or (fp.pixels and row[6] == fp.pixels):
+                    continue
+                if any(match.name == row[0] and match.folder == row[1] for match in matches):
+                    continue
+                matches.append(HashMatch(*row[:5], distance=distance))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def resolve(self, ref, approved):
+        """Settle the submissions of one poll: approved ones become permanent, the rest are dropped."""
+        with self._lock, self._db:
+            if approved:
+                self._db.execute("UPDATE hashes SET kind = ? WHERE kind = ? AND ref = ?", (PERMANENT, SUBMISSION, str(ref)))
+                return
+            row_ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM hashes WHERE kind = ? AND ref = ?", (SUBMISSION, str(ref))
+            )]
+            self._db.execute("DELETE FROM hashes WHERE kind = ? AND ref = ?", (SUBMISSION, str(ref)))
+            for row_id in row_ids:
+                self._dhashes.pop(row_id, None)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class UpscaleCache:
+    """LRU cache of encoded upscaled sprites with a byte budget.
+
+    Entries live in memory and, when `disk_dir` is set, in a second on-disk
+    tier that outlives restarts. Keys include whatever identifies the source
+    content (Drive id + modifiedTime, or a SHA-256) and the upscale factor.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.size = 0
+        self.disk_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_size = sum(entry.stat().st_size for entry in os.scandir(disk_dir) if entry.is_file())
+
+    @staticmethod
+    def key(source_id, version, upscale_factor, *extra):
+        return ":".join(str(part) for part in (source_id, version, upscale_factor, *extra))
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha256(key.encode()).hexdigest() + ".png")
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                # Touch so the disk tier evicts least recently used first
+                os.utime(self._disk_path(key))
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, data)
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self._put_memory(key, data)
+        if self.disk_dir and len(data) <= self.disk_max_bytes:
+            path = self._disk_path(key)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                with self._lock:
+                    self.disk_size += len(data)
+                self._trim_disk()
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def _trim_disk(self):
+        if self.disk_size <= self.disk_max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".png")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self.disk_size <= self.disk_max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.disk_size -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "disk_bytes": self.disk_size,
+            }
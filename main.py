@@ -3,69 +3,123 @@ from interactions import (
 )
 import aiohttp
 import asyncio
-from googleapiclient.http import MediaIoBaseDownload
-from datetime import datetime
 import io
 import hashlib
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from google.cloud import firestore
-from google.cloud import secretmanager
+import time
+import tempfile
+from dataclasses import dataclass, field
 import os
 import json
-from PIL import Image
-from flask import request
+import logging
+from drive_index import DriveIndex, FOLDER_MIME_TYPE, FILE_FIELDS
+from folders import ARCHIVE_FOLDER_ID, FOLDER_MAPPING
+from drive_crawler import crawl, crawl_async, list_children
+from download_manager import DownloadManager, fetch_media
+from executor import run_blocking
+from clients import ClientRegistry
+from review_scheduler import ReviewScheduler, PendingReview
+from image_cache import UpscaleCache
+from credits_engine import CreditsView, paginate
+from todo_tracker import TodoTracker
+from delivery import deliver, send_queue
+from mirror import Mirror
+from sprite_archive import read_sprite_archive
+from hash_index import HashIndex, PERMANENT, SUBMISSION, fingerprint
+import metrics
+from rate_limit import BULK, backoff, call_firestore, with_priority
+from worker import JobQueue, WORKER_QUEUE_PATH, start_workers
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+log = logging.getLogger("sprite-bot")
 
 bot = Client(token=os.environ["DISCORD_TOKEN"], intents=Intents.DEFAULT)
 
-# Map for Google Drive folder IDs
-FOLDER_MAPPING = {
-    "temporary": {
-        "item": "1BQEyVG8ylKk7oAp8Jhz9M5gxtMhFO3a4",
-        "block": "18P3L5YvbgYGYVLadQTQBD-TeI0tm6YSC",
-        "particle": "1sXocLrUNiGZbJGzJld0IZGk-ftnvngwk",
-        "misc": "1bwf7tLbc0OFQXwxomH3nelpru6l7PQax",
-        "model": "1CofC0kIjF-NwKI6Q2ZBr2fOZ6j9ZJ5pc",
-        "painting": "1GIV8xibgHAX1Kv4OSwH3w1Vl5Js_4JM-",
-        "entities": "19l75hUh5PQX6cNO54-tkk7MTm0NAhjBy",
-        "gui": "1ujlruXhKbsROIdsGJjMEnH4GQ2OuAPQ5"
-    },
-    "permanent": {
-        "item": "1NolwQk9msuyexp584AbCWbkv7K-c3FPh",
-        "block": "1QFwm04ug7TKxgdlLlEOv4hV6Hl5By5HX",
-        "particle": "1w3pEEtapERgv1hGQAZKQQ8fI5StjFC8K",
-        "misc": "1j0BE7E2guJ3WPWXnTOA_vctjsNvt22yL",
-        "model": "16lncPCMlHXhQBMVzQvEkXX0-Jyl163fC",
-        "painting": "1b2c0QL7caM04smn2L7yKynEtWh4uylQ0",
-        "entities": "1VOD3d9PDmzw9czvRh2Lh95qEc2tc0mMx",
-        "gui": "13x2lDkeBr78326cxAxjboHsTtCrjCCba"
-    }
-}
-
-UPLOAD_HISTORY = {}  # Tracks uploaded files
-is_found = True
-is_found_upscale = True
-is_found_recursive = True
+archive_folder_checked = False
+BATCH_LIMIT = 100  # Drive batch requests take at most 100 calls
+
+# Every file under the folders above, kept fresh through the Drive Changes API
+drive_index = DriveIndex([folder_id for folders in FOLDER_MAPPING.values() for folder_id in folders.values()])
+DRIVE_INDEX_SYNC_INTERVAL = int(os.environ.get("DRIVE_INDEX_SYNC_INTERVAL", "60"))
+warm_up_task = None
+
+# Drive and Firestore clients shared by every command
+clients = ClientRegistry()
+
+# Open review polls, persisted so they survive restarts
+REVIEW_DURATION = 86405  # Seconds before a poll is tallied
+REVIEW_DB_PATH = os.environ.get("REVIEW_DB_PATH", "reviews.db")
+review_scheduler_task = None
+
+# Encoded upscales keyed on Drive id + modifiedTime (or content hash) and factor
+upscale_cache = UpscaleCache(
+    max_bytes=int(os.environ.get("UPSCALE_CACHE_BYTES", str(64 * 1024 * 1024))),
+    disk_dir=os.environ.get("UPSCALE_CACHE_DIR"),
+    disk_max_bytes=int(os.environ.get("UPSCALE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+)
+
+# Submissions are spooled in memory and only hit disk above this size
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Textures not touched since their folder's cutoff, per permanent folder.
+# TODO_CUTOFFS overrides the cutoff per folder, e.g. {"item": "2025-01-01T00:00:00.000Z"}
+TODO_DEFAULT_CUTOFF = "2024-12-20T00:00:00.000Z"
+todo_tracker = TodoTracker(
+    drive_index,
+    FOLDER_MAPPING["permanent"],
+    json.loads(os.environ.get("TODO_CUTOFFS", "{}")),
+    TODO_DEFAULT_CUTOFF
+)
+TODO_PAGE_SIZE = 1000
+
+# Live copy of the Firestore `sprites` collection for /credits
+credits_view = CreditsView()
+CREDITS_PAGE_SIZE = 200
+creator_names = {}  # creator id -> display name
+
+# Fingerprints of pending submissions and permanent sprites, checked before any Drive write
+HASH_INDEX_PATH = os.environ.get("HASH_INDEX_PATH", "hashes.db")
+hash_index = HashIndex(HASH_INDEX_PATH)
+MAX_REVIEW_NOTES_LENGTH = 1500
+
+# Optional local mirror of the permanent folders (and resource pack zip),
+# refreshed from the Drive index whenever it changes
+MIRROR_DIR = os.environ.get("MIRROR_DIR")
+MIRROR_PACK_PATH = os.environ.get("MIRROR_PACK_PATH")
+mirror = Mirror(MIRROR_DIR, FOLDER_MAPPING["permanent"]) if MIRROR_DIR else None
+
+# Optional worker mode: upscales, previews, fingerprints and cold Drive listings go to
+# worker processes through a shared job queue. WORKER_PROCESSES=0 when they run elsewhere
+WORKER_MODE = os.environ.get("WORKER_MODE", "").lower() in ("1", "true", "yes")
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+job_queue = JobQueue(WORKER_QUEUE_PATH) if WORKER_MODE else None
+worker_processes = []
+
+# Prometheus-format /metrics endpoint, disabled when METRICS_PORT is empty
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("METRICS_PORT", "9090")
+metrics_runner = None
 
 def authenticate_db():
-    credentials = Credentials.from_service_account_file("credentials_db.json") # Initialize Firestore client with credentials
-    db = firestore.Client(credentials=credentials)
-    return db
+    return clients.firestore()
 
 def authenticate_drive():
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    creds = Credentials.from_service_account_file("credentials.json", scopes=SCOPES)
-    service = build("drive", "v3", credentials=creds)
-    return service
+    # Per-thread service, only use it from the thread that asked for it
+    return clients.drive()
 
 def add_sprite(db, sprite_name, creator_id, creator_name, folder,):
     doc_ref = db.collection('sprites').document(sprite_name)
-    doc_ref.set({
-        'creator_id': creator_id,
-        'creator_name': creator_name,
-        'sprite_name': sprite_name,
-        'folder': folder
-    })
+    with metrics.track_call("firestore", "write"):
+        doc_ref.set({
+            'creator_id': creator_id,
+            'creator_name': creator_name,
+            'sprite_name': sprite_name,
+            'folder': folder
+        })
 
 def get_sprites(db, sprite_name=None, creator_name=None, creator_id=None, folder=None):
     sprites_ref = db.collection('sprites')
@@ -83,232 +137,441 @@ def get_sprites(db, sprite_name=None, creator_name=None, creator_id=None, folder
     if creator_id:
         query = query.where('creator_id', '==', creator_id)
 
-    docs = query.stream()
-
     results = []
-    for doc in docs:
-        print(f'Document ID: {doc.id}')
-        results.append(doc.to_dict())
+    with metrics.track_call("firestore", "query"):
+        for doc in query.stream():
+            log.debug("Document ID: %s", doc.id)
+            results.append(doc.to_dict())
     
     if not results:
-        print('No documents found!')
+        log.debug("No documents found!")
     
     return results
 
 def recursive_search(service, parent_folder_id, file_name=None):
-    global is_found_recursive
     from googleapiclient.errors import HttpError
 
-    def search_files(query, page_token=None):
-        response = service.files().list(
-            q=query,
-            spaces="drive",
-            fields="nextPageToken, files(id, name, parents, modifiedTime)",
-            includeItemsFromAllDrives=True,
-            supportsAllDrives=True,
-            pageToken=page_token
-        ).execute()
-        return response.get("files", []), response.get("nextPageToken", None)
-
+    # Breadth-first, sibling folders OR-ed into one paged query per level
     try:
-        if file_name:
-            query = f"'{parent_folder_id}' in parents and name = '{file_name}' and trashed = false"
-        else:
-            query = f"'{parent_folder_id}' in parents and trashed = false"
+        for file in crawl(service, parent_folder_id, file_name):
+            log.debug("Found file: %s (ID: %s)", file['name'], file['id'])
+            yield file
+
+    except HttpError as e:
+        log.error("An error occurred: %s", e)
+    except Exception as e:
+        log.exception("An unexpected error occurred: %s", e)
 
-        page_token = None
-        while True:
-            files, page_token = search_files(query, page_token)
-            print(f"Searching in folder ID: {parent_folder_id}, found {len(files)} files")
+        return
 
-            for file in files:
-                print(f"Found file: {file['name']} (ID: {file['id']})")
-                is_found_recursive = True
-                yield file
+def find_files(service, folder_id, file_name):
+    # Dictionary hit on the index, live search only on a miss
+    if drive_index.ready:
+        found_files = drive_index.find(file_name, folder_id)
+        if found_files:
+            return found_files
+    found_files = list(recursive_search(service, folder_id, file_name))
+    for file in found_files:
+        drive_index.add(file)
+    return found_files
 
-            # Exit the loop if there are no more pages
-            if not page_token:
-                break
+def list_files(service, folder_id):
+    if drive_index.ready:
+        return drive_index.walk(folder_id)
+    return [file for file in recursive_search(service, folder_id) if file.get("mimeType") != FOLDER_MIME_TYPE]
 
-        # Now search for subfolders
-        subfolders_query = f"'{parent_folder_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        subfolders, _ = search_files(subfolders_query)
-        
-        for subfolder in subfolders:
-            print(f"Searching in subfolder: {subfolder['name']} (ID: {subfolder['id']})")
-            yield from recursive_search(service, subfolder['id'], file_name)
+async def retry_until_done(what, func, *args):
+    # Startup work is retried with jittered backoff, giving up would leave the views cold for good
+    attempt = 0
+    while True:
+        try:
+            return await func(*args)
+        except Exception as e:
+            delay = backoff(min(attempt, 6))
+            log.exception("Error %s, retrying in %.0fs: %s", what, delay, e)
+            await asyncio.sleep(delay)
+            attempt += 1
 
-    except HttpError as e:
-        print(f"An error occurred: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+async def start_clients():
+    await run_blocking("drive", clients.start)
+    await run_blocking("firestore", with_db, credits_view.start)
+
+async def build_drive_index():
+    # Index upkeep is background work, interactive Drive calls go first when quota runs short
+    await run_blocking("drive", with_priority(BULK, with_drive), drive_index.build)
+    await run_blocking("drive", todo_tracker.load)
+
+async def warm_up():
+    await retry_until_done("starting Google clients", start_clients)
+    await keep_drive_index_fresh()
+
+async def keep_drive_index_fresh():
+    await retry_until_done("building Drive index", build_drive_index)
+    await refresh_mirror()
+    while True:
+        await asyncio.sleep(DRIVE_INDEX_SYNC_INTERVAL)
+        try:
+            applied = await run_blocking("drive", with_priority(BULK, with_drive), drive_index.sync)
+            if applied:
+                log.info("Drive index applied %d changes", applied)
+                await refresh_mirror()
+        except Exception as e:
+            log.exception("Error syncing Drive index: %s", e)
+
+def mirror_download(file):
+    return with_drive(fetch_media, file["id"], file.get("size"))
 
+def sync_mirror():
+    mirror.sync(drive_index, mirror_download)
+    index_mirrored_sprites()
+    if MIRROR_PACK_PATH:
+        mirror.build_pack(MIRROR_PACK_PATH)
+
+def index_mirrored_sprites():
+    # Mirrored content is local already, so every permanent sprite gets fingerprinted
+    added = 0
+    for file_id, entry in mirror.manifest.items():
+        if hash_index.has_md5(entry["md5"]):
+            continue
+        with open(mirror.object_path(entry["md5"]), "rb") as f:
+            hash_index.add(fingerprint(f.read()), os.path.basename(entry["path"]), entry["folder"], PERMANENT, file_id)
+        added += 1
+    if added:
+        log.info("Fingerprinted %d mirrored sprites", added)
+
+async def refresh_mirror():
+    if mirror is None:
         return
+    try:
+        await run_blocking("drive", with_priority(BULK, sync_mirror))
+    except Exception as e:
+        log.exception("Error refreshing mirror: %s", e)
 
-def upload_to_drive(service, file_name: str, folder_id: str):
+def check_archive_folder(service):
+    global archive_folder_checked
     from googleapiclient.errors import HttpError
-    from googleapiclient.http import MediaFileUpload
-    import os
+    if archive_folder_checked:
+        return True
+    try:
+        service.files().get(fileId=ARCHIVE_FOLDER_ID, supportsAllDrives=True).execute()
+        log.info("Archive folder ID '%s' is valid and accessible.", ARCHIVE_FOLDER_ID)
+        archive_folder_checked = True
+    except HttpError as e:
+        log.error("Error accessing archive folder ID '%s': %s", ARCHIVE_FOLDER_ID, e)
+    return archive_folder_checked
+
+@dataclass
+class UploadResult:
+    found: bool = False  # Whether an existing file with the same name was found and archived
+    moved_ids: list = field(default_factory=list)
+    file_id: str = None  # Id of the newly uploaded file, None if nothing was uploaded
+    timings: dict = field(default_factory=dict)  # Seconds spent per step
 
-    global is_found
-    global is_found_recursive
-    is_found_recursive = False  # Initialize to False before search
-    is_found = False  # Keeps track of whether any file with the same name was found
+def upload_to_drive(service, file_name: str, folder_id: str, file_data, mimetype="image/png", found_files=None):
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseUpload
 
-    # New folder where the old files will be moved
-    archive_folder_id = "1W9Zw6bRhL3nS6gj4S23YBcIdizaWdesN"
+    # Everything about this upload lives in its own result, so concurrent uploads can't interfere
+    result = UploadResult()
 
     try:
-        # Check if archive folder exists and has correct permissions
-        try:
-            service.files().get(fileId=archive_folder_id).execute()
-            print(f"Archive folder ID '{archive_folder_id}' is valid and accessible.")
-        except HttpError as e:
-            print(f"Error accessing archive folder ID '{archive_folder_id}': {e}")
-            return None
+        # Check once that the archive folder exists and has correct permissions
+        if not check_archive_folder(service):
+            return result
 
-        # Search files recursively
-        found_files = list(recursive_search(service, folder_id, file_name))
+        # Look up existing files through the index, unless the caller already resolved them
+        if found_files is None:
+            started = time.perf_counter()
+            found_files = find_files(service, folder_id, file_name)
+            result.timings["search"] = time.perf_counter() - started
         
-        print(f"Found files: {found_files}")
+        log.debug("Found files: %s", found_files)
 
         if not found_files:
-            print(f"No existing file with the name '{file_name}' found in the folder or subfolders.")
-            is_found = False
+            log.info("No existing file with the name '%s' found in the folder or subfolders.", file_name)
         else:
-            for file in found_files:
-                file_id = file['id']
-                print(f"Processing file ID: {file_id}")
-                # Move file to the archive folder
-                try:
-                    service.files().update(
-                        fileId=file_id,
-                        addParents=archive_folder_id,
+            # Move every match to the archive folder in one batch request
+            def moved(request_id, response, exception):
+                file = found_files[int(request_id)]
+                if exception:
+                    log.error("Error moving file %s (ID: %s): %s", file['name'], file['id'], exception)
+                else:
+                    log.info("Moved existing file: %s to archive folder", file['name'])
+                    drive_index.remove(file['id'])
+                    result.moved_ids.append(file['id'])
+                    result.found = True
+
+            started = time.perf_counter()
+            for start in range(0, len(found_files), BATCH_LIMIT):
+                batch = service.new_batch_http_request(callback=moved)
+                for i, file in enumerate(found_files[start:start + BATCH_LIMIT], start):
+                    batch.add(service.files().update(
+                        fileId=file['id'],
+                        addParents=ARCHIVE_FOLDER_ID,
                         removeParents=file["parents"][0],  # Ensure to remove from the correct parent
                         fields='id, parents'
-                    ).execute()
-                    print(f"Moved existing file: {file['name']} to archive folder")
-                    is_found = True
-                except HttpError as e:
-                    print(f"Error moving file {file['name']} (ID: {file_id}): {e}")
+                    ), request_id=str(i))
+                batch.execute()
+            result.timings["move"] = time.perf_counter() - started
 
     except HttpError as e:
-        print(f"Error searching or moving existing files: {e}")
-        return None
+        log.error("Error searching or moving existing files: %s", e)
+        return result
 
     # Only upload if a file was found and moved
-    if is_found:
-        print(f"Proceeding to upload '{file_name}'.")
+    if result.found:
+        log.debug("Proceeding to upload '%s'.", file_name)
         file_metadata = {"name": file_name, "parents": [folder_id]}
-        file_path = os.path.join(os.getcwd(), file_name)  # Assuming file_name exists in the current directory
-        media = MediaFileUpload(file_path, resumable=True)
+        # Small sprites go up in a single request, large ones in resumable chunks
+        file_data.seek(0, io.SEEK_END)
+        resumable = file_data.tell() > RESUMABLE_UPLOAD_THRESHOLD
+        file_data.seek(0)
+        media = MediaIoBaseUpload(file_data, mimetype=mimetype, chunksize=UPLOAD_CHUNK_SIZE, resumable=resumable)
 
+        started = time.perf_counter()
         try:
             uploaded_file = service.files().create(
                 body=file_metadata,
                 media_body=media,
-                fields="id",
+                fields=FILE_FIELDS,
                 supportsAllDrives=True
             ).execute()
-            print(f"File uploaded successfully. File ID: {uploaded_file.get('id')}")
-            return uploaded_file.get("id")
+            drive_index.add(uploaded_file)
+            log.info("File uploaded successfully. File ID: %s", uploaded_file.get('id'))
+            result.file_id = uploaded_file.get("id")
         except HttpError as e:
-            print(f"Error uploading file to Drive: {e}")
-            return None
+            log.error("Error uploading file to Drive: %s", e)
+        result.timings["upload"] = time.perf_counter() - started
     else:
-        print(f"Upload skipped: No existing file named '{file_name}' found in the folder.")
+        log.info("Upload skipped: No existing file named '%s' found in the folder.", file_name)
+    return result
 
-def hash_file_content(file_path: str) -> str:
-    """Generate a hash for the file content."""
+async def read_attachment(url):
+    """Stream an attachment into a spooled temp file, hashing it in the same pass."""
     hasher = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        hasher.update(f.read())
-    return hasher.hexdigest()
-
-def download_file(service, file_id):
-    global is_found_upscale
-    if is_found_upscale == True:
-        request = service.files().get_media(fileId=file_id)
-        file_data = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_data, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            print(f"Download {int(status.progress() * 100)}%.")
-        
-        file_data.seek(0)  # Go back to the start of the file data
-        return file_data
-    else:
-        print("File not found")
-    
-def upscale_image(image_source, upscale_factor=5):
+    file_data = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            if response.status != 200:
+                file_data.close()
+                return None, None
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                hasher.update(chunk)
+                file_data.write(chunk)
+                metrics.inc("api_bytes_total", len(chunk), api="discord", direction="received", command=metrics.current_command.get())
+    file_data.seek(0)
+    return file_data, hasher.hexdigest()
+
+def upscale_image(image_source, upscale_factor=5, encoder="fast"):
+    from PIL import Image
+
     if isinstance(image_source, str):
         # If the source is a file path
         with Image.open(image_source) as img:
-            return process_image(img, upscale_factor)
-    elif isinstance(image_source, io.BytesIO):
-        # If the source is a BytesIO object
+            return process_image(img, upscale_factor, encoder)
+    elif hasattr(image_source, "read"):
+        # If the source is a BytesIO or other file object
         image_source.seek(0)
         with Image.open(image_source) as img:
-            return process_image(img, upscale_factor)
+            return process_image(img, upscale_factor, encoder)
     else:
         raise ValueError("Unsupported image source type")
 
-def process_image(img, upscale_factor):
-    # Perform nearest neighbor upscale
-    new_size = (img.width * upscale_factor, img.height * upscale_factor)
-    upscaled_img = img.resize(new_size, Image.NEAREST)
+def process_image(img, upscale_factor, encoder="fast"):
+    import upscaler
+
+    # Perform nearest neighbor upscale on the raw pixel buffer, clamped to the max output size
+    upscaled_img = upscaler.upscale(img, upscale_factor)
     
     # Save the upscaled image to BytesIO
-    upscaled_image_data = io.BytesIO()
-    upscaled_img.save(upscaled_image_data, format="PNG")
-    upscaled_image_data.seek(0)
-    
-    return upscaled_image_data
-
-def split_message_on_word_boundary(message, max_length, credits=False):
-    if credits:
-        # Split each credit line into separate entries
-        lines = message.split('\n')
-        chunks = []
-        current_chunk = ""
-
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > max_length:
-                chunks.append(current_chunk.strip())
-                current_chunk = line
-            else:
-                current_chunk += "\n" + line
+    return upscaler.encode_png(upscaled_img, encoder)
+
+# Async wrappers so slash commands can await Google API and Pillow work off the event loop.
+# The client is looked up inside the worker thread, so each thread uses its own transport.
+def with_drive(func, *args):
+    return func(authenticate_drive(), *args)
+
+def with_db(func, *args):
+    # Firestore calls share one token bucket and are retried on quota and server errors
+    return call_firestore(func, authenticate_db(), *args)
+
+async def find_first_async(folder_id, file_name):
+    # Index hit, or a concurrent crawl that stops at the first match
+    if drive_index.ready:
+        found_files = drive_index.find(file_name, folder_id)
+        if found_files:
+            return found_files[0]
+    crawler = crawl_async(run_drive, folder_id, file_name)
+    try:
+        async for file in crawler:
+            drive_index.add(file)
+            return file
+    finally:
+        await crawler.aclose()
+    return None
+
+async def run_drive(func, *args):
+    return await run_blocking("drive", with_drive, func, *args)
+
+download_manager = DownloadManager(run_drive)
+
+async def list_files_async(folder_id):
+    if job_queue and not drive_index.ready:
+        # Full traversal, handed to a worker while the index is still loading
+        return await job_queue.submit("list_files", folder_id, priority=BULK)
+    return await run_blocking("drive", with_drive, list_files, folder_id)
+
+async def download_file_async(file):
+    # Coalesced with any identical download already in flight
+    return io.BytesIO(await download_manager.download(file))
+
+async def upload_to_drive_async(file_name, folder_id, file_data, mimetype="image/png", found_files=None):
+    return await run_blocking("drive", with_drive, upload_to_drive, file_name, folder_id, file_data, mimetype, found_files)
 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+async def files_by_name_async(folder_id):
+    # One traversal (or index walk) of the folder, for resolving many names at once
+    files_by_name = {}
+    for file in await list_files_async(folder_id):
+        files_by_name.setdefault(file["name"], []).append(file)
+    return files_by_name
+
+async def add_sprite_async(sprite_name, creator_id, creator_name, folder):
+    return await run_blocking("firestore", with_db, add_sprite, sprite_name, creator_id, creator_name, folder)
+
+async def get_sprites_async(sprite_name=None, creator_name=None, creator_id=None, folder=None):
+    return await run_blocking("firestore", with_db, get_sprites, sprite_name, creator_name, creator_id, folder)
+
+async def upscale_drive_file_async(file, upscale_factor=5, encoder="fast"):
+    # A cache hit skips both the Drive download and the re-encode
+    key = UpscaleCache.key(file["id"], file.get("modifiedTime"), upscale_factor, encoder)
+    data = upscale_cache.get(key)
+    if data is None:
+        if job_queue:
+            data = await job_queue.submit("upscale", file, upscale_factor, encoder)
+        else:
+            file_data = await download_file_async(file)
+            data = (await run_blocking("image", upscale_image, file_data, upscale_factor, encoder)).getvalue()
+        upscale_cache.put(key, data)
+    return io.BytesIO(data)
+
+async def find_mcmeta_async(file):
+    # An animated texture's .png.mcmeta sits next to it
+    name = f"{file['name']}.mcmeta"
+    if drive_index.ready:
+        matches = [match for match in drive_index.find(name) if match.get("parents") == file.get("parents")]
     else:
-        # Ensure that each filename is separated by a newline
-        lines = message.split() 
-        chunks = [] 
-        current_chunk = ""
-        
-        for line in lines: 
-            if len(current_chunk) + len(line) + 1 > max_length:
-                chunks.append(current_chunk.strip()) 
-                current_chunk = line 
-            else:
-                if current_chunk:  # Ensure there is no leading newline
-                    current_chunk += "\n" + line
-                else:
-                    current_chunk = line
+        matches = await run_drive(list_children, file.get("parents", [])[:1], name)
+        matches = [match for match in matches if match["name"] == name]
+    return matches[0] if matches else None
+
+async def render_preview_async(current_file, file_data, sha256):
+    """One old | new | changes preview (animated for .png.mcmeta strips), cached per version pair."""
+    key = UpscaleCache.key(current_file["id"], current_file.get("modifiedTime"), "preview", sha256)
+    data = upscale_cache.get(key)
+    if data is None:
+        mcmeta_file = await find_mcmeta_async(current_file)
+        if job_queue:
+            data = await job_queue.submit("preview", current_file, mcmeta_file, file_data)
+        else:
+            old, mcmeta = await asyncio.gather(
+                download_file_async(current_file),
+                download_file_async(mcmeta_file) if mcmeta_file else asyncio.sleep(0)
+            )
+            data = (await run_blocking(
+                "image", render_preview, old.getvalue(), file_data, mcmeta.getvalue() if mcmeta else None
+            )).getvalue()
+        upscale_cache.put(key, data)
+    return io.BytesIO(data), "gif" if data.startswith(b"GIF8") else "png"
+
+def render_preview(old_data, new_data, mcmeta=None):
+    import preview
 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+    output, _ = preview.compare(old_data, new_data, mcmeta=mcmeta)
+    return output
 
-    return chunks
+async def fingerprint_async(data):
+    if job_queue:
+        return await job_queue.submit("fingerprint", data)
+    return await run_blocking("image", fingerprint, data)
 
+async def check_submission(file_name, folder, data, current_file):
+    """Fingerprint a submission and decide, before anything is written to Drive, whether it's needed.
+
+    Returns the fingerprint, the reason to reject it (None to go ahead) and notes for reviewers.
+    """
+    fp = await fingerprint_async(data)
+    current_md5 = current_file.get("md5Checksum") if current_file else None
+    if current_md5 == fp.md5:
+        return fp, "it is identical to the current sprite", []
+    if current_md5 and not hash_index.has_md5(current_md5):
+        # First time this version is seen, fingerprint it so re-encodes of it are caught too
+        current = await download_file_async(current_file)
+        current_fp = await fingerprint_async(current.getvalue())
+        hash_index.add(current_fp, file_name, folder, PERMANENT, current_file["id"])
+
+    notes = []
+    for match in hash_index.exact(fp):
+        same_sprite = match.name == file_name and match.folder == folder
+        if match.kind == PERMANENT and current_md5 and match.md5 == current_md5:
+            return fp, "it has the same pixels as the current sprite", []
+        if match.kind == SUBMISSION and same_sprite:
+            return fp, "the same image is already awaiting review", []
+        if not same_sprite:
+            notes.append(f"{file_name} is identical to {match.name} in {match.folder}")
+    for match in hash_index.near(fp):
+        if match.kind == PERMANENT and match.name == file_name and match.folder == folder:
+            continue  # Close to its own earlier versions, as expected
+        pending = " (awaiting review)" if match.kind == SUBMISSION else ""
+        notes.append(f"{file_name} looks like {match.name} in {match.folder}{pending}, {match.distance}/64 hash bits differ")
+    return fp, None, notes
+
+def review_notes(notes):
+    if not notes:
+        return ""
+    text = "\nPossible duplicates:\n" + "\n".join(notes)
+    if len(text) > MAX_REVIEW_NOTES_LENGTH:
+        text = text[:MAX_REVIEW_NOTES_LENGTH - 3] + "..."
+    return text
+
+def render_contact_sheet(pairs):
+    import preview
+
+    return preview.contact_sheet(pairs)
+
+async def render_contact_sheet_async(pairs):
+    if job_queue:
+        return io.BytesIO(await job_queue.submit("contact_sheet", pairs))
+    return await run_blocking("image", render_contact_sheet, pairs)
+
+def creator_display_name(result):
+    # Resolve each creator once, falling back to the name stored with the sprite
+    creator_id = result.get('creator_id')
+    if creator_id not in creator_names:
+        user = bot.get_user(creator_id)
+        creator_names[creator_id] = user.global_name if user else result.get('creator_name')
+    return creator_names[creator_id]
 
 @listen()
 async def on_ready():
+    global warm_up_task, review_scheduler_task, metrics_runner, worker_processes
     await bot.synchronise_interactions()
-    print("Ready")
-    print(f"This bot is owned by {bot.owner}")
+    # Google clients and local views load in the background, commands that
+    # arrive first build clients on demand and use the live fallbacks
+    if warm_up_task is None:
+        warm_up_task = asyncio.create_task(warm_up())
+    if review_scheduler_task is None:
+        review_scheduler_task = asyncio.create_task(review_scheduler.run())
+    if job_queue and not worker_processes and WORKER_PROCESSES:
+        await run_blocking("jobs", job_queue.clear)
+        worker_processes = start_workers(WORKER_QUEUE_PATH, WORKER_PROCESSES)
+        log.info("Started %d worker processes", len(worker_processes))
+    if metrics_runner is None and METRICS_PORT:
+        try:
+            metrics_runner = await metrics.serve(METRICS_HOST, int(METRICS_PORT))
+        except OSError as e:
+            log.error("Could not start metrics endpoint: %s", e)
+    log.info("Ready")
+    log.info("This bot is owned by %s", bot.owner)
 
 @slash_command(name="upload", description="Upload sprite for review")
 @slash_option(
@@ -333,96 +596,322 @@ async def on_ready():
     required=True,
     opt_type=OptionType.ATTACHMENT
 )
+@metrics.instrument_command("upload")
 async def upload_sprite(ctx: SlashContext, folder: str, image: Attachment):
-    # Download the image
-    async with aiohttp.ClientSession() as session:
-        async with session.get(image.url) as response:
-            if response.status == 200:
-                # Save image locally
-                file_path = f"./{image.filename}"
-                with open(file_path, "wb") as f:
-                    f.write(await response.read())
-                await ctx.send("Thank you for your submission!", delete_after=60)
-                poll_channel = bot.get_channel("1318971041610993725")
-                print(ctx.author.global_name)
-
-                service = authenticate_drive()
-                db = authenticate_db()
-                perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
-                found_files = list(recursive_search(service, perm_folder_id, image.filename)) 
-                if found_files: 
-                    file_id = found_files[0]['id'] 
-                    print(f"File ID found: {file_id}") 
-                else:
-                    file_id = None
-                    print("File ID not found")
-                # Download the file from Google Drive
-                if file_id:
-                    file_data = download_file(service, file_id)
-                    
-                    # Send the downloaded file as an attachment
-                    image_ = File(file=upscale_image(file_data), file_name=image.filename)
-                    await poll_channel.send("Old", files=[image_])
-
-                    upscaled_image_data = upscale_image(file_path)
-
-                    _image = File(file=upscaled_image_data, file_name=f"upscaled_{image.filename}")
-                    await poll_channel.send("New", files=[_image])
-                
-                # Upload to temporary folder immediately
-                temp_folder_id = FOLDER_MAPPING["temporary"].get(folder)
-                if temp_folder_id:
-                    upload_to_drive(service, image.filename, temp_folder_id)
-                    if is_found == True:
-                        print(f"File uploaded to temporary `{folder}` folder.")
-                    else:
-                        await ctx.send("File upload failed, no file found or another issue occurred.")
-                else:
-                    await ctx.send(f"Temporary folder `{folder}` not found.")
-                
-                # Polling after upload
-                if is_found == True:
-                    _question = PollMedia(text="Is this acceptable?")
-                    _answer_yes = PollAnswer(poll_media=PollMedia(text="Yes"), answer_id=1)
-                    _answer_no = PollAnswer(poll_media=PollMedia(text="No"), answer_id=2)
-                    _poll = Poll(
-                        question=_question,
-                        answers=[_answer_yes, _answer_no],
-                        duration=12
-                    )
-                    # Send poll
-                    poll_message = await poll_channel.send(content=f"<@&1317840840324022273> {image.filename}", poll=_poll)
-
-                    # Track the results
-                    await asyncio.sleep(86405)
-                    results_yes = poll_message.answer_voters(answer_id=1)
-                    results_no = poll_message.answer_voters(answer_id=2)
-                    _yes = 0
-                    _no = 0
-                    async for x in results_yes: 
-                        _yes += 1
-                    async for y in results_no: 
-                        _no += 1
-                    print(f"Yes:{_yes}, No:{_no}")
-                    if _yes > _no:
-                        perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
-                        if temp_folder_id:
-                            upload_to_drive(service, image.filename, perm_folder_id)
-                            if is_found == True:
-                                print(f"File uploaded to temporary `{folder}` folder.")
-                                add_sprite(db, image.filename, ctx.author.id, ctx.author.global_name, folder)
-                                await ctx.author.send(f"Your sprite '{image.filename}' was approved!")
-                            else:
-                                print("File upload failed, no file found or another issue occurred.")
-                        else:
-                            await ctx.send(f"Temporary folder `{folder}` not found.")
-                        
-                    else:
-                        await ctx.author.send(f"Your sprite '{image.filename}' was denied :(")
-                            
-                    
-                else:
-                    await ctx.send("No file with this name could be found, perhaps check your spelling, or the folder you selected?")
+    # Stream the image into memory, hashing it as it arrives
+    file_data, sha256 = await read_attachment(image.url)
+    if file_data is None:
+        return
+    with file_data:
+        await ctx.send("Thank you for your submission!", delete_after=60)
+        poll_channel = bot.get_channel("1318971041610993725")
+        log.info("Submission of %s from %s", image.filename, ctx.author.global_name)
+
+        perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
+        found_file = await find_first_async(perm_folder_id, image.filename)
+        if found_file: 
+            file_id = found_file['id'] 
+            log.debug("File ID found: %s", file_id)
+        else:
+            file_id = None
+            log.debug("File ID not found")
+        # Re-submissions of the current sprite or of a pending one stop here, before any Drive write
+        data = file_data.read()
+        file_data.seek(0)
+        fp, reason, notes = await check_submission(image.filename, folder, data, found_file)
+        if reason:
+            await ctx.send(f"'{image.filename}' wasn't submitted: {reason}.")
+            return
+
+        if file_id:
+            # Old, new and the changed pixels in a single attachment
+            preview_data, extension = await render_preview_async(found_file, data, sha256)
+            base_name = image.filename.rsplit(".", 1)[0]
+            _image = File(file=preview_data, file_name=f"preview_{base_name}.{extension}")
+            await poll_channel.send("Old | New | Changes", files=[_image])
+        
+        # Upload to temporary folder immediately
+        temp_folder_id = FOLDER_MAPPING["temporary"].get(folder)
+        upload = UploadResult()
+        if temp_folder_id:
+            upload = await upload_to_drive_async(image.filename, temp_folder_id, file_data, image.content_type or "image/png")
+            if upload.file_id:
+                log.info("File uploaded to temporary `%s` folder.", folder)
+            elif upload.found:
+                # The old temporary copy was archived but the new one never arrived
+                await ctx.send(f"'{image.filename}' couldn't be uploaded for review, please try submitting it again.")
+            else:
+                await ctx.send("File upload failed, no file found or another issue occurred.")
+        else:
+            await ctx.send(f"Temporary folder `{folder}` not found.")
+        
+        # Polling after upload, only once the submission is actually in the temporary folder
+        if upload.file_id:
+            _question = PollMedia(text="Is this acceptable?")
+            _answer_yes = PollAnswer(poll_media=PollMedia(text="Yes"), answer_id=1)
+            _answer_no = PollAnswer(poll_media=PollMedia(text="No"), answer_id=2)
+            _poll = Poll(
+                question=_question,
+                answers=[_answer_yes, _answer_no],
+                duration=12
+            )
+            # Send poll
+            poll_message = await poll_channel.send(content=f"<@&1317840840324022273> {image.filename}{review_notes(notes)}", poll=_poll)
+            hash_index.add(fp, image.filename, folder, SUBMISSION, poll_message.id)
+
+            # Tallied by the review scheduler once the deadline passes, the approved
+            # version is then copied over from the temporary upload
+            review_scheduler.add(PendingReview(
+                message_id=int(poll_message.id),
+                channel_id=int(poll_channel.id),
+                filename=image.filename,
+                folder=folder,
+                author_id=int(ctx.author.id),
+                author_name=ctx.author.global_name,
+                deadline=time.time() + REVIEW_DURATION,
+                payload={"temp_file_id": upload.file_id, "sha256": sha256}
+            ))
+            
+        elif not upload.found:
+            await ctx.send("No file with this name could be found, perhaps check your spelling, or the folder you selected?")
+
+@slash_command(name="upload-batch", description="Upload a zip of sprites for review")
+@slash_option(
+    name="folder",
+    description="The sprites' folder",
+    required=True,
+    opt_type=OptionType.STRING,
+    choices=[
+        SlashCommandChoice(name="Items", value="item"),
+        SlashCommandChoice(name="Blocks", value="block"),
+        SlashCommandChoice(name="Particles", value="particle"),
+        SlashCommandChoice(name="Misc", value="misc"),
+        SlashCommandChoice(name="Models", value="model"),
+        SlashCommandChoice(name="Painting", value="painting"),
+        SlashCommandChoice(name="Entities", value="entities"),
+        SlashCommandChoice(name="GUI", value="gui")
+    ]
+)
+@slash_option(
+    name="archive",
+    description="Zip file of sprites to be uploaded",
+    required=True,
+    opt_type=OptionType.ATTACHMENT
+)
+@metrics.instrument_command("upload-batch")
+async def upload_batch(ctx: SlashContext, folder: str, archive: Attachment):
+    # Acknowledge first, a large zip can take longer to fetch and unpack than Discord waits for a response
+    await ctx.send("Thank you for your submission!", delete_after=60)
+    # Stream the archive in, then validate and hash every sprite in one pass over it
+    file_data, sha256 = await read_attachment(archive.url)
+    if file_data is None:
+        await ctx.send(f"'{archive.filename}' couldn't be downloaded, please try again.")
+        return
+    with file_data:
+        sprites, rejected = await run_blocking("image", read_sprite_archive, file_data)
+    poll_channel = bot.get_channel("1318971041610993725")
+    log.info("Batch submission of %s (%d sprites) from %s", archive.filename, len(sprites), ctx.author.global_name)
+
+    perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
+    temp_folder_id = FOLDER_MAPPING["temporary"].get(folder)
+    if not temp_folder_id:
+        await ctx.send(f"Temporary folder `{folder}` not found.")
+        return
+
+    # One traversal of each tree resolves every name in the batch
+    perm_files, temp_files = await asyncio.gather(
+        files_by_name_async(perm_folder_id),
+        files_by_name_async(temp_folder_id)
+    )
+    candidates = []
+    for sprite in sprites:
+        if sprite.name in perm_files:
+            candidates.append(sprite)
+        else:
+            rejected.append((sprite.name, "no existing sprite with this name"))
+
+    # Duplicates and no-op changes are dropped before anything is written to Drive
+    checks = await asyncio.gather(*(
+        check_submission(sprite.name, folder, sprite.data, perm_files[sprite.name][0]) for sprite in candidates
+    ))
+    matched = []
+    fingerprints = {}
+    notes = []
+    for sprite, (fp, reason, sprite_notes) in zip(candidates, checks):
+        if reason:
+            rejected.append((sprite.name, reason))
+        else:
+            matched.append(sprite)
+            fingerprints[sprite.name] = fp
+            notes.extend(sprite_notes)
+
+    # Old versions come down while the new ones go up to the temporary folder
+    olds, uploads = await asyncio.gather(
+        asyncio.gather(*(download_file_async(perm_files[sprite.name][0]) for sprite in matched)),
+        asyncio.gather(*(
+            upload_to_drive_async(sprite.name, temp_folder_id, io.BytesIO(sprite.data), "image/png", temp_files.get(sprite.name, []))
+            for sprite in matched
+        ))
+    )
+    submitted = []
+    pairs = []
+    for sprite, old, upload in zip(matched, olds, uploads):
+        if upload.file_id:
+            submitted.append({"filename": sprite.name, "temp_file_id": upload.file_id, "sha256": sprite.sha256})
+            pairs.append((sprite.name, old.getvalue(), sprite.data))
+        else:
+            rejected.append((sprite.name, "upload to the temporary folder failed"))
+
+    if submitted:
+        # A single contact sheet and a single poll for the whole batch
+        sheet = await render_contact_sheet_async(pairs)
+        await poll_channel.send(
+            f"{len(submitted)} sprites from {ctx.author.global_name} (old | new){review_notes(notes)}",
+            files=[File(file=sheet, file_name=f"batch_{archive.filename}.png")]
+        )
+        _question = PollMedia(text="Are these acceptable?")
+        _answer_yes = PollAnswer(poll_media=PollMedia(text="Yes"), answer_id=1)
+        _answer_no = PollAnswer(poll_media=PollMedia(text="No"), answer_id=2)
+        _poll = Poll(
+            question=_question,
+            answers=[_answer_yes, _answer_no],
+            duration=12
+        )
+        poll_message = await poll_channel.send(
+            content=f"<@&1317840840324022273> {archive.filename} ({len(submitted)} sprites)",
+            poll=_poll
+        )
+        for file in submitted:
+            hash_index.add(fingerprints[file["filename"]], file["filename"], folder, SUBMISSION, poll_message.id)
+        review_scheduler.add(PendingReview(
+            message_id=int(poll_message.id),
+            channel_id=int(poll_channel.id),
+            filename=archive.filename,
+            folder=folder,
+            author_id=int(ctx.author.id),
+            author_name=ctx.author.global_name,
+            deadline=time.time() + REVIEW_DURATION,
+            payload={"files": submitted, "sha256": sha256}
+        ))
+
+    header = f"{len(submitted)} of {len(submitted) + len(rejected)} sprites submitted for review."
+    if rejected:
+        header += " These were left out:"
+    await deliver(
+        f"channel:{ctx.channel_id}", ctx.send,
+        [f"{name}: {reason}" for name, reason in rejected], "rejected.txt", header=header
+    )
+
+async def promote_upload(file_name, temp_file_id, folder):
+    # Copy an approved submission over from its temporary upload
+    if not temp_file_id:
+        log.warning("No temporary upload recorded for '%s', skipping.", file_name)
+        return False
+    file_data = await download_file_async(temp_file_id)
+    upload = await upload_to_drive_async(file_name, FOLDER_MAPPING["permanent"].get(folder), file_data)
+    if upload.file_id:
+        log.info("File uploaded to permanent `%s` folder.", folder)
+        return True
+    log.error("File upload failed, no file found or another issue occurred.")
+    return False
+
+async def notify_author(author, message):
+    # Best effort, closed DMs must not fail (and so repeat) the rest of a tally
+    if author is None:
+        return
+    try:
+        await author.send(message)
+    except Exception as e:
+        log.warning("Could not DM %s: %s", author.id, e)
+
+async def count_votes(review):
+    """(yes, no) votes on a review's poll, None if the poll no longer exists."""
+    poll_channel = await bot.fetch_channel(review.channel_id)
+    poll_message = await poll_channel.fetch_message(review.message_id) if poll_channel else None
+    if poll_message is None:
+        return None
+    _yes = 0
+    _no = 0
+    async for x in poll_message.answer_voters(answer_id=1):
+        _yes += 1
+    async for y in poll_message.answer_voters(answer_id=2):
+        _no += 1
+    return _yes, _no
+
+async def tally_review(review: PendingReview):
+    # Every step is recorded in the payload once done, so a retried tally
+    # never promotes or credits the same sprite twice
+    progress = review.payload
+    if "approved" not in progress:
+        votes = await count_votes(review)
+        if votes is None:
+            log.warning("Poll for %s (message %s) no longer exists, dropping the review", review.filename, review.message_id)
+            hash_index.resolve(review.message_id, approved=False)
+            return
+        log.info("Review of %s: Yes:%d, No:%d", review.filename, *votes)
+        progress["approved"] = votes[0] > votes[1]
+        review_scheduler.save_payload(review.message_id, progress)
+    author = await bot.fetch_user(review.author_id)
+    if not progress["approved"]:
+        hash_index.resolve(review.message_id, approved=False)
+        await notify_author(author, f"Your sprite '{review.filename}' was denied :(")
+        return
+
+    # Batch submissions list every sprite in it, they all go through together
+    files = progress.get("files") or [{"filename": review.filename, "temp_file_id": progress.get("temp_file_id")}]
+    promoted = progress.setdefault("promoted", {})  # file name -> whether it reached the permanent folder
+    pending = [file for file in files if file["filename"] not in promoted]
+    results = await asyncio.gather(*(
+        promote_upload(file["filename"], file.get("temp_file_id"), review.folder) for file in pending
+    ), return_exceptions=True)
+    for file, result in zip(pending, results):
+        if not isinstance(result, BaseException):
+            promoted[file["filename"]] = result
+    review_scheduler.save_payload(review.message_id, progress)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    approved = [file["filename"] for file in files if promoted[file["filename"]]]
+    credited = progress.setdefault("credited", [])
+    for file_name in approved:
+        if file_name not in credited:
+            await add_sprite_async(file_name, review.author_id, review.author_name, review.folder)
+            credited.append(file_name)
+            review_scheduler.save_payload(review.message_id, progress)
+    hash_index.resolve(review.message_id, approved=bool(approved))
+
+    if progress.get("notified"):
+        return
+    if "files" in progress:
+        await notify_author(author, f"Your batch '{review.filename}' was approved! {len(approved)} of {len(files)} sprites were added.")
+    elif approved:
+        await notify_author(author, f"Your sprite '{review.filename}' was approved!")
+    else:
+        await notify_author(author, f"Your sprite '{review.filename}' was approved, but it couldn't be added to the pack. Please ask a moderator.")
+    progress["notified"] = True
+    review_scheduler.save_payload(review.message_id, progress)
+
+def drop_review(review: PendingReview):
+    # Gave up tallying, the submission no longer counts as awaiting review
+    hash_index.resolve(review.message_id, approved=False)
+
+review_scheduler = ReviewScheduler(REVIEW_DB_PATH, tally_review, drop_review)
+
+metrics.registry.describe("upscale_cache", "gauge", "Upscale cache counters and sizes.")
+metrics.registry.gauge("upscale_cache", lambda: {(("stat", k),): v for k, v in upscale_cache.stats().items()})
+metrics.registry.describe("downloads", "gauge", "Drive media download manager state.")
+metrics.registry.gauge("downloads", lambda: {
+    (("stat", k),): getattr(download_manager, k) for k in ("queue_depth", "active", "downloads", "coalesced", "bytes")
+})
+metrics.registry.describe("pending_reviews", "gauge", "Review polls waiting to be tallied.")
+metrics.registry.gauge("pending_reviews", lambda: {(): review_scheduler.count()})
+metrics.registry.describe("hash_index_entries", "gauge", "Fingerprints of submissions and permanent sprites.")
+metrics.registry.gauge("hash_index_entries", lambda: {(): hash_index.count()})
+metrics.registry.describe("worker_jobs_waiting", "gauge", "Worker jobs this gateway is waiting on.")
+metrics.registry.gauge("worker_jobs_waiting", lambda: {(): job_queue.waiting} if job_queue else {})
+metrics.registry.describe("drive_index_entries", "gauge", "Files and folders in the Drive index.")
+metrics.registry.gauge("drive_index_entries", lambda: {(): len(drive_index.files)})
 
 @slash_command(name="fetch", description="Get a sprite from the resource pack")
 @slash_option(
@@ -447,27 +936,33 @@ async def upload_sprite(ctx: SlashContext, folder: str, image: Attachment):
     required=True,
     opt_type=OptionType.STRING
 )
-async def fetch_sprite(ctx: SlashContext, folder: str, name: str):
+@slash_option(
+    name="scale",
+    description="Upscale factor, defaults to 5 (optional)",
+    required=False,
+    opt_type=OptionType.INTEGER,
+    min_value=1,
+    max_value=32
+)
+@metrics.instrument_command("fetch")
+async def fetch_sprite(ctx: SlashContext, folder: str, name: str, scale: int=5):
     await ctx.send("Processing...")
-    service = authenticate_drive()
     perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
     
-    found_files = list(recursive_search(service, perm_folder_id, name)) 
-    if found_files: 
-        file_id = found_files[0]['id'] 
-        print(f"File ID found: {file_id}") 
+    found_file = await find_first_async(perm_folder_id, name)
+    if found_file: 
+        file_id = found_file['id'] 
+        log.debug("File ID found: %s", file_id)
     else:
-        print("File ID not found")
+        log.debug("File ID not found")
         file_id = None
     # Download the file from Google Drive
 
     if file_id:
-        # Download the file from Google Drive
-        file_data = download_file(service, file_id)
-                    
-        # Send the downloaded file as an attachment
-        image_ = File(file=upscale_image(file_data), file_name=name)
-        await ctx.author.send("Here's the sprite you requested", files=[image_])
+        # Download (or reuse the cached upscale of) the file from Google Drive
+        image_ = File(file=await upscale_drive_file_async(found_file, scale), file_name=name)
+        # Paced with the user's other DMs, but ahead of any bulk /to-do output
+        await send_queue.send(f"dm:{ctx.author.id}", ctx.author.send, "Here's the sprite you requested", files=[image_])
     else:
         await ctx.send(f"Seems that sprite '{name}' doesn't exist, perhaps check your spelling?")
     
@@ -490,30 +985,34 @@ async def fetch_sprite(ctx: SlashContext, folder: str, name: str):
         SlashCommandChoice(name="GUI", value="gui")
     ]
 )
-async def to_do(ctx: SlashContext, folder: str):
+@slash_option(
+    name="page",
+    description="Page of results to show, defaults to 1 (optional)",
+    required=False,
+    opt_type=OptionType.INTEGER,
+    min_value=1
+)
+@metrics.instrument_command("to-do")
+async def to_do(ctx: SlashContext, folder: str, page: int=1):
     await ctx.send("Processing...", delete_after=60)
-    service = authenticate_drive()
-    perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
-    found_files = list(recursive_search(service, perm_folder_id))
-    timestamp = "2024-12-20T00:00:00.000Z"
-    todo = []
-    for file in found_files:
-        name = file['name']
-        modified_time = file['modifiedTime']
-        dt = datetime.strptime(modified_time, "%Y-%m-%dT%H:%M:%S.%fZ")
-        tdt = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
-        if dt < tdt:
-            todo.append(name)
-    todo.sort()
-    todo_string = "\n".join(todo)
-    
-    # Split the message into chunks with word boundaries
-    max_length = 1900
-    todo_chunks = split_message_on_word_boundary(todo_string, max_length, credits=False)
-
-    await ctx.author.send(f"Here's a list of all textures that haven't been done in the '{folder}' folder:")
-    for chunk in todo_chunks:
-        await ctx.author.send(f"\n{chunk}")
+    if todo_tracker.ready:
+        # Read straight out of the precomputed per-folder set
+        done, total = todo_tracker.progress(folder)
+        pages = max(1, -(-todo_tracker.count(folder) // TODO_PAGE_SIZE))
+        page = min(page, pages)
+        todo = todo_tracker.todo(folder, (page - 1) * TODO_PAGE_SIZE, page * TODO_PAGE_SIZE)
+    else:
+        perm_folder_id = FOLDER_MAPPING["permanent"].get(folder)
+        found_files = await list_files_async(perm_folder_id)
+        cutoff = todo_tracker.cutoffs[folder]
+        todo = sorted(file['name'] for file in found_files if file['modifiedTime'] < cutoff)
+        done, total = len(found_files) - len(todo), len(found_files)
+        todo, pages = paginate(todo, page, TODO_PAGE_SIZE)
+    header = f"Here's a list of all textures that haven't been done in the '{folder}' folder ({done}/{total} done):"
+    if pages > 1:
+        header = f"Here's a list of all textures that haven't been done in the '{folder}' folder ({done}/{total} done, page {page} of {pages}):"
+    # Paced chunked DMs, or a single text file for large folders
+    await deliver(f"dm:{ctx.author.id}", ctx.author.send, todo, f"todo_{folder}.txt", header=header)
 
 @slash_command(name="credits", description="Fetch credits by user, folder, sprite name, creator, or all.")
 @slash_option(
@@ -542,48 +1041,51 @@ async def to_do(ctx: SlashContext, folder: str):
     description="The name of the sprite you're searching for (optional)",
     opt_type=OptionType.STRING
 )
-async def credits(ctx: SlashContext, folder: str=None, name: str=None, sprite_name: str=None):
+@slash_option(
+    name="page",
+    description="Page of results to show, defaults to 1 (optional)",
+    required=False,
+    opt_type=OptionType.INTEGER,
+    min_value=1
+)
+@metrics.instrument_command("credits")
+async def credits(ctx: SlashContext, folder: str=None, name: str=None, sprite_name: str=None, page: int=1):
     await ctx.send("Processing...")
-    db = authenticate_db()
-    results = get_sprites(db, sprite_name, name, folder)
+    # Served from the live local view, Firestore is only queried until it has loaded
+    if credits_view.ready.is_set():
+        results = credits_view.query(sprite_name, name, folder=folder)
+    else:
+        results = await get_sprites_async(sprite_name, name, folder=folder)
+        results.sort(key=lambda result: str(result.get('sprite_name', '')).lower())
+    results, pages = paginate(results, page, CREDITS_PAGE_SIZE)
 
     credits = []
     for result in results:
         _sprite_name = result.get('sprite_name')
-        _creator_id = result.get('creator_id')
         _folder = result.get('folder')
-        _creator_name = bot.get_user(_creator_id)
-        _creator_name = _creator_name.global_name
+        _creator_name = creator_display_name(result)
         credit = f"{_sprite_name} in {_folder} created by: {_creator_name}"
         credits.append(credit)
     credits.sort()
-    credits_string = "\n".join(credits)
-    
-    max_length = 1900
-    credits_chunks = split_message_on_word_boundary(credits_string, max_length, credits=True)
-    
-    await ctx.edit(message="@original", content="Here's a list of the credits you requested:")
-    for chunk in credits_chunks:
-        if chunk:
-            await ctx.send(f"\n{chunk}")
-        else:
-            await ctx.edit(message="@original", content="Credit couldn't be found, perhaps check your spelling?")
+
+    if not credits:
+        await ctx.edit(message="@original", content="Credit couldn't be found, perhaps check your spelling?")
+        return
+    header = "Here's a list of the credits you requested:"
+    if pages > 1:
+        header = f"Here's a list of the credits you requested (page {min(page, pages)} of {pages}):"
+    await ctx.edit(message="@original", content=header)
+    await deliver(f"channel:{ctx.channel_id}", ctx.send, credits, "credits.txt")
 
 # Define the main function to handle HTTP requests and start the bot
 
 async def run_bot():
     try:
-        print("Starting bot...")  # Debug print
+        log.info("Starting bot...")
         await bot.astart()
-        print("Bot started")  # Debug print
+        log.info("Bot started")
     except Exception as e:
-        print(f"Error starting bot: {e}")
+        log.exception("Error starting bot: %s", e)
 
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-
-    # Schedule bot start in event loop
-    loop.create_task(run_bot())
-
-    # Keep the event loop running
-    loop.run_forever()
+    asyncio.run(run_bot())
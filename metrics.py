@@ -0,0 +1,200 @@
+import bisect
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+PREFIX = "sprite_bot_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counters, histograms and callback gauges, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = {}  # name -> callable returning {labels: value}
+        self.help = {}  # name -> (type, help)
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, read):
+        """Register `read()`, returning {labels dict as tuple: value}, evaluated at scrape time."""
+        self.gauges[name] = read
+
+    def render(self):
+        lines = []
+        described = set()
+
+        def header(name):
+            if name in self.help and name not in described:
+                kind, text = self.help[name]
+                lines.append(f"# HELP {PREFIX}{name} {text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                described.add(name)
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.sum, h.count, h.buckets) for key, h in histograms]
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value:g}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            header(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total:g}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+        for name, read in sorted(self.gauges.items()):
+            try:
+                values = read()
+            except Exception:
+                log.exception("Error reading gauge %s", name)
+                continue
+            header(name)
+            for labels, value in sorted(values.items()):
+                lines.append(f"{PREFIX}{name}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels) + "}"
+
+
+registry = Registry()
+
+# Slash command being handled, API traffic is labelled with it. Blocking calls
+# see it because run_blocking runs them in a copy of the caller's context
+current_command = contextvars.ContextVar("current_command", default="none")
+registry.describe("command_seconds", "histogram", "Slash command latency.")
+registry.describe("commands_total", "counter", "Slash commands handled.")
+registry.describe("command_errors_total", "counter", "Slash commands that raised.")
+registry.describe("api_seconds", "histogram", "Google API call latency.")
+registry.describe("api_calls_total", "counter", "Google API calls (HTTP round-trips for Drive), by command.")
+registry.describe("api_errors_total", "counter", "Google API calls that failed or returned an error status, by command.")
+registry.describe("api_bytes_total", "counter", "Bytes sent and received by API calls, by command.")
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+@contextmanager
+def track_call(api, op):
+    """Count and time one API call, recording it as an error if it raises."""
+    started = time.perf_counter()
+    command = current_command.get()
+    try:
+        yield
+    except Exception:
+        registry.inc("api_errors_total", api=api, op=op, command=command)
+        raise
+    finally:
+        registry.inc("api_calls_total", api=api, op=op, command=command)
+        registry.observe("api_seconds", time.perf_counter() - started, api=api, op=op)
+
+
+def instrument_command(name):
+    """Decorator recording latency, count and errors of a slash command callback."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            token = current_command.set(name)
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                registry.inc("command_errors_total", command=name)
+                log.exception("Error in /%s", name)
+                raise
+            finally:
+                current_command.reset(token)
+                registry.inc("commands_total", command=name)
+                registry.observe("command_seconds", time.perf_counter() - started, command=name)
+        return wrapper
+    return decorator
+
+
+class InstrumentedHttp:
+    """Wraps an httplib2-style transport, recording every Drive HTTP round-trip."""
+
+    def __init__(self, http, api="drive"):
+        self.http = http
+        self.api = api
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        if "/batch/" in uri:
+            op = "batch"
+        elif "/upload/" in uri:
+            op = "upload"
+        elif "alt=media" in uri:
+            op = "media"
+        else:
+            op = "read" if method == "GET" else "write"
+        command = current_command.get()
+        with track_call(self.api, op):
+            response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+            if body:
+                registry.inc("api_bytes_total", len(body), api=self.api, direction="sent", command=command)
+            registry.inc("api_bytes_total", len(content or b""), api=self.api, direction="received", command=command)
+            if int(response.status) >= 400:
+                registry.inc("api_errors_total", api=self.api, op=op, command=command)
+        return response, content
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+async def serve(host, port):
+    """Expose /metrics on a local HTTP endpoint."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Metrics endpoint listening on http://%s:%s/metrics", host, port)
+    return runner
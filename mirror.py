@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from drive_crawler import FOLDER_MIME_TYPE
+from rate_limit import BULK, set_thread_priority
+
+log = logging.getLogger(__name__)
+
+MIRROR_WORKERS = int(os.environ.get("MIRROR_WORKERS", "8"))
+PACK_FORMAT = int(os.environ.get("PACK_FORMAT", "34"))
+PACK_DESCRIPTION = "Sprite Club community texture pack"
+# Drive folder name -> directory under assets/minecraft/textures
+PACK_DIRS = {
+    "item": "item",
+    "block": "block",
+    "particle": "particle",
+    "misc": "misc",
+    "model": "model",
+    "painting": "painting",
+    "entities": "entity",
+    "gui": "gui",
+}
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Mirror:
+    """Local copy of the permanent Drive folders, for bulk export.
+
+    File contents live in a content-addressed store keyed on Drive's
+    md5Checksum, so a sync only downloads content it has never seen, and
+    manifest.json maps each Drive file to its md5 and path inside the pack.
+    """
+
+    def __init__(self, root_dir, folders):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self.manifest_path = os.path.join(root_dir, "manifest.json")
+        self.pack_state_path = os.path.join(root_dir, "pack.json")
+        self.folders = {root_id: folder for folder, root_id in folders.items()}  # root id -> folder name
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.manifest = self._load(self.manifest_path)  # file id -> entry
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def object_path(self, md5):
+        return os.path.join(self.objects_dir, md5[:2], md5)
+
+    def has_object(self, md5):
+        return os.path.exists(self.object_path(md5))
+
+    def _store(self, md5, data):
+        if hashlib.md5(data).hexdigest() != md5:
+            raise ValueError(f"Checksum mismatch for object {md5}")
+        os.makedirs(os.path.dirname(self.object_path(md5)), exist_ok=True)
+        _write_atomic(self.object_path(md5), data)
+
+    def _entries(self, index):
+        """Desired manifest from the Drive index: file id -> entry, no API calls."""
+        entries = {}
+        for root_id, folder in self.folders.items():
+            files = index.walk(root_id, include_folders=True)
+            folder_names = {file["id"]: file for file in files if file.get("mimeType") == FOLDER_MIME_TYPE}
+            paths = {root_id: ""}
+
+            def path_of(folder_id):
+                if folder_id not in paths:
+                    folder_file = folder_names.get(folder_id)
+                    if folder_file is None:
+                        return None
+                    parent = path_of(folder_file["parents"][0])
+                    paths[folder_id] = None if parent is None else f"{parent}{folder_file['name']}/"
+                return paths[folder_id]
+
+            for file in files:
+                if file.get("mimeType") == FOLDER_MIME_TYPE or not file.get("md5Checksum"):
+                    continue  # Folders and native Google files have no content to mirror
+                parent_path = path_of(file["parents"][0])
+                if parent_path is None:
+                    continue
+                entries[file["id"]] = {
+                    "folder": folder,
+                    "path": parent_path + file["name"],
+                    "md5": file["md5Checksum"],
+                    "modifiedTime": file.get("modifiedTime"),
+                    "size": int(file.get("size", 0)),
+                }
+        return entries
+
+    def sync(self, index, download, workers=MIRROR_WORKERS):
+        """Bring the store and manifest up to date with the Drive index.
+
+        `download(file)` returns the content of a Drive file and must be safe
+        to call from several threads. Only md5s missing from the store are
+        fetched; files that fail to download are left out and retried next sync.
+        """
+        started = time.perf_counter()
+        entries = self._entries(index)
+        missing = {}  # md5 -> a file with that content
+        for file_id, entry in entries.items():
+            if not self.has_object(entry["md5"]):
+                missing.setdefault(entry["md5"], {"id": file_id, "size": entry["size"]})
+
+        failed = set()
+        downloaded_bytes = 0
+
+        def fetch(item):
+            md5, file = item
+            try:
+                data = download(file)
+                self._store(md5, data)
+                return len(data)
+            except Exception as e:
+                log.error("Error mirroring %s: %s", file["id"], e)
+                with self._lock:
+                    failed.add(md5)
+                return 0
+
+        if missing:
+            # Mirror downloads give way to interactive Drive calls when quota runs short
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mirror",
+                                    initializer=set_thread_priority, initargs=(BULK,)) as pool:
+                downloaded_bytes = sum(pool.map(fetch, missing.items()))
+
+        entries = {file_id: entry for file_id, entry in entries.items() if entry["md5"] not in failed}
+        stats = {
+            "files": len(entries),
+            "added": len(entries.keys() - self.manifest.keys()),
+            "removed": len(self.manifest.keys() - entries.keys()),
+            "changed": sum(1 for file_id, entry in entries.items() if self.manifest.get(file_id, entry) != entry),
+            "downloaded": len(missing) - len(failed),
+            "failed": len(failed),
+            "bytes": downloaded_bytes,
+        }
+        if entries != self.manifest:
+            self.manifest = entries
+            _write_atomic(self.manifest_path, json.dumps(entries, indent=1, sort_keys=True).encode())
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        log.info("Mirror synced: %s", stats)
+        return stats
+
+    def pack_entries(self):
+        """Zip entry name -> md5 for every mirrored file, newest file wins a shared path."""
+        chosen = {}
+        for entry in self.manifest.values():
+            directory = PACK_DIRS.get(entry["folder"], entry["folder"])
+            name = f"assets/minecraft/textures/{directory}/{entry['path']}"
+            current = chosen.get(name)
+            if current is None or (entry["modifiedTime"] or "") > (current["modifiedTime"] or ""):
+                chosen[name] = entry
+        return {name: entry["md5"] for name, entry in chosen.items()}
+
+    def _write_entry(self, pack, name, md5):
+        # PNGs are already deflated, storing them makes writing the pack a plain copy
+        compression = zipfile.ZIP_STORED if name.endswith(".png") else zipfile.ZIP_DEFLATED
+        pack.write(self.object_path(md5), name, compress_type=compression)
+
+    def build_pack(self, pack_path):
+        """Write the resource pack zip, touching only entries that changed since the last build.
+
+        Additions are appended to the existing zip; changed or removed entries
+        need a rewrite, which copies stored PNGs from the store uncompressed.
+        """
+        started = time.perf_counter()
+        pack_path = os.path.abspath(pack_path)
+        entries = self.pack_entries()
+        state = self._load(self.pack_state_path)
+        previous = state.get("entries") if state.get("path") == pack_path and os.path.exists(pack_path) else None
+
+        copied = 0
+        if previous == entries:
+            mode, written = "unchanged", 0
+        elif previous is not None and all(entries.get(name) == md5 for name, md5 in previous.items()):
+            mode = "append"
+            added = {name: md5 for name, md5 in entries.items() if name not in previous}
+            with zipfile.ZipFile(pack_path, "a") as pack:
+                for name, md5 in sorted(added.items()):
+                    self._write_entry(pack, name, md5)
+            written = len(added)
+        else:
+            mode = "rebuild"
+            unchanged = sum(1 for name, md5 in entries.items() if (previous or {}).get(name) == md5)
+            written, copied = len(entries) - unchanged, unchanged
+            tmp_path = f"{pack_path}.tmp"
+            with zipfile.ZipFile(tmp_path, "w") as pack:
+                meta = {"pack": {"pack_format": PACK_FORMAT, "description": PACK_DESCRIPTION}}
+                pack.writestr("pack.mcmeta", json.dumps(meta, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+                for name, md5 in sorted(entries.items()):
+                    self._write_entry(pack, name, md5)
+            os.replace(tmp_path, pack_path)
+
+        if mode != "unchanged":
+            _write_atomic(self.pack_state_path, json.dumps({"path": pack_path, "entries": entries}).encode())
+        stats = {"mode": mode, "entries": len(entries), "written": written, "copied": copied,
+                 "seconds": round(time.perf_counter() - started, 3)}
+        log.info("Resource pack %s: %s", pack_path, stats)
+        return stats
+
+    def prune(self):
+        """Delete stored objects no longer referenced by the manifest."""
+        referenced = {entry["md5"] for entry in self.manifest.values()}
+        removed = 0
+        for directory in os.listdir(self.objects_dir):
+            for md5 in os.listdir(os.path.join(self.objects_dir, directory)):
+                if md5 not in referenced:
+                    os.remove(os.path.join(self.objects_dir, directory, md5))
+                    removed += 1
+        return removed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mirror the permanent Drive folders and build a resource pack.")
+    parser.add_argument("directory", help="Mirror directory (object store and manifests)")
+    parser.add_argument("--pack", help="Resource pack zip to build after syncing")
+    parser.add_argument("--workers", type=int, default=MIRROR_WORKERS)
+    parser.add_argument("--prune", action="store_true", help="Delete objects no longer in any permanent folder")
+    args = parser.parse_args()
+
+    # Folder ids and Drive clients without importing the bot itself
+    from clients import ClientRegistry
+    from download_manager import fetch_media
+    from drive_index import DriveIndex
+    from folders import FOLDER_MAPPING
+
+    clients = ClientRegistry()
+    folders = FOLDER_MAPPING["permanent"]
+    index = DriveIndex(folders.values())
+    index.build(clients.drive())
+    mirror = Mirror(args.directory, folders)
+    print(mirror.sync(index, lambda file: fetch_media(clients.drive(), file["id"], file.get("size")), args.workers))
+    if args.prune:
+        print(f"Pruned {mirror.prune()} objects")
+    if args.pack:
+        print(mirror.build_pack(args.pack))
@@ -0,0 +1,163 @@
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import upscaler
+
+# Old | new | changes previews: longest side of each panel, and the encoded size they must fit in
+PANEL_SIZE = int(os.environ.get("PREVIEW_PANEL_SIZE", "128"))
+PREVIEW_MAX_BYTES = int(os.environ.get("PREVIEW_MAX_BYTES", str(8 * 1024 * 1024)))
+ANIMATION_FORMAT = os.environ.get("PREVIEW_ANIMATION_FORMAT", "gif")  # "gif" or "apng"
+MAX_FRAMES = 64
+TICK_MS = 50  # One Minecraft game tick
+DIFF_COLOR = (255, 0, 255, 255)
+
+CELL_SIZE = 128  # Each sprite is scaled to fit a CELL_SIZE square
+PADDING = 8
+LABEL_HEIGHT = 14
+COLUMNS = 4  # Old/new pairs per row
+BACKGROUND = (49, 51, 56, 255)
+TEXT_COLOR = (219, 222, 225, 255)
+MISSING_COLOR = (90, 93, 99, 255)
+
+
+def open_sprite(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return img.convert("RGBA")
+
+
+def fit(img, size=CELL_SIZE):
+    """Nearest-neighbour scale to fit a size x size square, upscaling by whole factors only."""
+    if img.width <= size and img.height <= size:
+        return upscaler.upscale(img, size // max(img.width, img.height), max_side=size)
+    ratio = size / max(img.width, img.height)
+    return img.resize((max(1, int(img.width * ratio)), max(1, int(img.height * ratio))), Image.NEAREST)
+
+
+def _paste_centered(sheet, img, left, top, size):
+    sheet.alpha_composite(img, (left + (size - img.width) // 2, top + (size - img.height) // 2))
+
+
+def contact_sheet(pairs, columns=COLUMNS, size=CELL_SIZE, encoder="fast"):
+    """One PNG laying out (name, old PNG bytes or None, new PNG bytes) as old | new pairs in a grid."""
+    font = ImageFont.load_default()
+    pair_width = 2 * size + 3 * PADDING
+    pair_height = size + LABEL_HEIGHT + 2 * PADDING
+    columns = max(1, min(columns, len(pairs)))
+    rows = -(-len(pairs) // columns)
+    sheet = Image.new("RGBA", (columns * pair_width, rows * pair_height), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    for i, (name, old, new) in enumerate(pairs):
+        left = (i % columns) * pair_width + PADDING
+        top = (i // columns) * pair_height + PADDING
+        if old is None:
+            draw.rectangle((left, top, left + size - 1, top + size - 1), outline=MISSING_COLOR)
+            draw.line((left, top, left + size - 1, top + size - 1), fill=MISSING_COLOR)
+        else:
+            _paste_centered(sheet, fit(open_sprite(old), size), left, top, size)
+        _paste_centered(sheet, fit(open_sprite(new), size), left + size + PADDING, top, size)
+        label = name
+        while len(label) > 3 and draw.textlength(label, font=font) > 2 * size + PADDING:
+            label = label[:-4] + "..."
+        draw.text((left, top + size + 2), label, fill=TEXT_COLOR, font=font)
+    return upscaler.encode_png(sheet, encoder)
+
+
+def decode(data):
+    """RGBA pixel array of a PNG, with the colour under fully transparent pixels zeroed."""
+    with Image.open(io.BytesIO(data)) as img:
+        pixels = np.array(img.convert("RGBA"))
+    pixels[pixels[..., 3] == 0] = 0
+    return pixels
+
+
+def _pad(pixels, height, width):
+    return np.pad(pixels, ((0, height - pixels.shape[0]), (0, width - pixels.shape[1]), (0, 0)))
+
+
+def diff_panel(old, new):
+    """The new sprite greyed out, with every pixel that differs from the old one highlighted."""
+    changed = np.any(old != new, axis=-1)
+    # Luma, dimmed to a quarter so the highlighted pixels stand out
+    grey = (new[..., :3].astype(np.uint16) @ np.array([77, 150, 29], dtype=np.uint16) >> 10).astype(np.uint8)
+    panel = np.empty_like(new)
+    panel[..., :3] = grey[..., None] + 32
+    panel[..., 3] = new[..., 3] // 2
+    panel[changed] = DIFF_COLOR
+    return panel
+
+
+def side_by_side(old, new, diff=True):
+    """Old | new (| changes) as one array, panels padded to a common size with a 1px gap."""
+    height = max(old.shape[0], new.shape[0])
+    width = max(old.shape[1], new.shape[1])
+    old, new = _pad(old, height, width), _pad(new, height, width)
+    gap = np.zeros((height, 1, 4), dtype=np.uint8)
+    panels = [old, gap, new]
+    if diff:
+        panels += [gap, diff_panel(old, new)]
+    return np.concatenate(panels, axis=1)
+
+
+def animation(pixels, mcmeta):
+    """Frames and durations (ms) of a vertical animation strip described by a .png.mcmeta."""
+    meta = json.loads(mcmeta).get("animation", {})
+    width = meta.get("width", pixels.shape[1])
+    height = meta.get("height", width)
+    count = max(1, pixels.shape[0] // height)
+    frames = [pixels[i * height:(i + 1) * height, :width] for i in range(count)]
+    frametime = meta.get("frametime", 1)
+    sequence = []
+    for frame in meta.get("frames", range(count)):
+        if isinstance(frame, dict):
+            sequence.append((frame["index"] % count, frame.get("time", frametime)))
+        else:
+            sequence.append((frame % count, frametime))
+    return [(frames[index], time * TICK_MS) for index, time in sequence[:MAX_FRAMES]]
+
+
+def _encode(canvases, durations, factor, animation_format):
+    images = [Image.fromarray(upscaler.upscale_array(canvas, factor), "RGBA") for canvas in canvases]
+    output = io.BytesIO()
+    if len(images) == 1:
+        images[0].save(output, format="PNG", **upscaler.ENCODERS["fast"])
+        return output, "png"
+    if animation_format == "apng":
+        images[0].save(output, format="PNG", save_all=True, append_images=images[1:],
+                       duration=durations, loop=0, disposal=1, **upscaler.ENCODERS["fast"])
+        return output, "png"
+    images[0].save(output, format="GIF", save_all=True, append_images=images[1:],
+                   duration=durations, loop=0, disposal=2, optimize=False)
+    return output, "gif"
+
+
+def compare(old_data, new_data, diff=True, mcmeta=None, panel_size=PANEL_SIZE,
+            max_bytes=PREVIEW_MAX_BYTES, animation_format=ANIMATION_FORMAT):
+    """Render one preview of a submission against the current sprite.
+
+    Returns (file, extension): a PNG, or for animated textures (when the
+    .png.mcmeta is given) a GIF or APNG cycling old and new frames together.
+    The pixel-art upscale is dropped by halves until the result fits max_bytes.
+    """
+    old, new = decode(old_data), decode(new_data)
+    if mcmeta:
+        new_frames = animation(new, mcmeta)
+        old_frames = [frame for frame, _ in animation(old, mcmeta)]
+        canvases = [side_by_side(old_frames[i % len(old_frames)], frame, diff) for i, (frame, _) in enumerate(new_frames)]
+        durations = [duration for _, duration in new_frames]
+        side = max(new_frames[0][0].shape[:2] + old_frames[0].shape[:2])
+    else:
+        canvases = [side_by_side(old, new, diff)]
+        durations = []
+        side = max(old.shape[:2] + new.shape[:2])
+    height, width = canvases[0].shape[:2]
+    factor = upscaler.clamp_factor(width, height, max(1, panel_size // side))
+    while True:
+        output, extension = _encode(canvases, durations, factor, animation_format)
+        if output.tell() <= max_bytes or factor == 1:
+            output.seek(0)
+            return output, extension
+        factor //= 2
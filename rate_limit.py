@@ -0,0 +1,247 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Lower numbers go first: replies to a command are never queued behind bulk output or syncs
+INTERACTIVE = 0
+BULK = 1
+PRIORITIES = (INTERACTIVE, BULK)
+
+MAX_RETRIES = int(os.environ.get("API_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0  # Seconds, doubled per attempt before jitter
+BACKOFF_MAX = 64.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Drive reports quota exhaustion as 403 with one of these reasons
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "sharingRateLimitExceeded"}
+MIN_WAIT = 0.005
+
+metrics.registry.describe("api_retries_total", "counter", "API calls retried after a rate limit or server error.")
+metrics.registry.describe("rate_limit_wait_seconds_total", "counter", "Time spent waiting for a rate limit token.")
+
+
+class TokenBucket:
+    """Token bucket shared by threads and coroutines.
+
+    A caller may only take a token while nobody of a higher priority is
+    waiting for one, so bulk work yields to interactive work as soon as
+    the bucket runs dry.
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate  # Tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._lock = threading.Lock()
+
+    def _take(self, priority, tokens):
+        # 0 when taken, otherwise how long to sleep before trying again
+        tokens = min(tokens, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= tokens and not any(self._waiting[p] for p in PRIORITIES if p < priority):
+                self.tokens -= tokens
+                return 0
+            return max((tokens - self.tokens) / self.rate, MIN_WAIT)
+
+    def _wait(self, priority, delta):
+        with self._lock:
+            self._waiting[priority] += delta
+
+    def acquire(self, priority=INTERACTIVE, tokens=1):
+        """Block the calling thread until `tokens` are available."""
+        wait = self._take(priority, tokens)
+        if not wait:
+            return
+        started = time.monotonic()
+        self._wait(priority, 1)
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._take(priority, tokens)
+        finally:
+            self._wait(priority, -1)
+            metrics.inc("rate_limit_wait_seconds_total", time.monotonic() - started, bucket=self.name)
+
+    async def acquire_async(self, priority=INTERACTIVE, tokens=1):
+        """Like acquire(), without blocking the event loop."""
+        wait = self._take(priority, tokens)
+        if not wait:
+            return
+        started = time.monotonic()
+        self._wait(priority, 1)
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._take(priority, tokens)
+        finally:
+            self._wait(priority, -1)
+            metrics.inc("rate_limit_wait_seconds_total", time.monotonic() - started, bucket=self.name)
+
+
+def _rate(name, default):
+    return float(os.environ.get(name, default))
+
+
+# Defaults sit under the documented per-user quotas (Drive allows ~3 sustained writes/s)
+buckets = {
+    "drive_read": TokenBucket("drive_read", _rate("DRIVE_READ_RATE", "50"), _rate("DRIVE_READ_BURST", "100")),
+    "drive_write": TokenBucket("drive_write", _rate("DRIVE_WRITE_RATE", "3"), _rate("DRIVE_WRITE_BURST", "10")),
+    "firestore": TokenBucket("firestore", _rate("FIRESTORE_RATE", "50"), _rate("FIRESTORE_BURST", "100")),
+    "discord": TokenBucket("discord", _rate("DISCORD_RATE", "40"), _rate("DISCORD_BURST", "40")),
+}
+
+_thread_priority = threading.local()
+
+
+def set_thread_priority(priority):
+    """Priority of API calls made from this thread, e.g. as a bulk worker pool's initializer."""
+    _thread_priority.value = priority
+
+
+def thread_priority():
+    return getattr(_thread_priority, "value", INTERACTIVE)
+
+
+def with_priority(priority, func):
+    """Wrap a blocking function so the API calls it makes run at `priority`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = thread_priority()
+        set_thread_priority(priority)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            set_thread_priority(previous)
+    return wrapper
+
+
+def backoff(attempt, retry_after=None):
+    """Delay before retry number `attempt` (0-based): Retry-After if given, else full-jitter exponential."""
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None  # HTTP-date form, fall back to exponential backoff
+
+
+def _drive_rate_limited(status, content):
+    if status != 403:
+        return False
+    try:
+        errors = json.loads(content).get("error", {}).get("errors", [])
+    except (TypeError, ValueError, AttributeError):
+        return False
+    return any(error.get("reason") in RATE_LIMIT_REASONS for error in errors)
+
+
+class RateLimitedHttp:
+    """Wraps an httplib2-style transport with per-API token buckets and retries.
+
+    Reads and writes draw from separate buckets; a batch costs one token per
+    call it carries. 429, 5xx and Drive's 403 rate-limit errors are retried
+    with jittered exponential backoff, honoring Retry-After.
+    """
+
+    def __init__(self, http, read_bucket=None, write_bucket=None, api="drive"):
+        self.http = http
+        self.read_bucket = read_bucket or buckets["drive_read"]
+        self.write_bucket = write_bucket or buckets["drive_write"]
+        self.api = api
+
+    def _cost(self, uri, method, body):
+        if "/batch/" in uri and body:
+            parts = body.count(b"application/http" if isinstance(body, bytes) else "application/http")
+            # Batched calls are mostly writes (archive moves), charge them as such
+            return self.write_bucket, max(1, parts)
+        return (self.read_bucket if method == "GET" else self.write_bucket), 1
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        bucket, tokens = self._cost(uri, method, body)
+        attempt = 0
+        while True:
+            bucket.acquire(thread_priority(), tokens)
+            response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+            status = int(response.status)
+            retryable = status in RETRY_STATUSES or _drive_rate_limited(status, content)
+            if not retryable or attempt >= MAX_RETRIES:
+                return response, content
+            delay = backoff(attempt, parse_retry_after(response.get("retry-after")))
+            log.warning("%s %s returned %d, retrying in %.1fs", self.api, method, status, delay)
+            metrics.inc("api_retries_total", api=self.api, status=status)
+            time.sleep(delay)
+            attempt += 1
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def _firestore_retryable(e):
+    from google.api_core import exceptions
+
+    return isinstance(e, (exceptions.TooManyRequests, exceptions.ResourceExhausted,
+                          exceptions.ServiceUnavailable, exceptions.InternalServerError))
+
+
+def call_firestore(func, *args):
+    """Run a blocking Firestore call under the Firestore bucket, retrying quota and server errors."""
+    attempt = 0
+    while True:
+        buckets["firestore"].acquire(thread_priority())
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt >= MAX_RETRIES or not _firestore_retryable(e):
+                raise
+            delay = backoff(attempt)
+            log.warning("firestore call failed (%s), retrying in %.1fs", e, delay)
+            metrics.inc("api_retries_total", api="firestore", status=type(e).__name__)
+            time.sleep(delay)
+            attempt += 1
+
+
+def _discord_retry_after(e):
+    status = getattr(e, "status", None)
+    if status not in RETRY_STATUSES:
+        return False, None
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    return True, parse_retry_after(headers.get("Retry-After"))
+
+
+async def call_discord(bucket, send, *args, priority=INTERACTIVE, **kwargs):
+    """Await a Discord send under the global and a per-destination bucket, retrying 429s and 5xx."""
+    attempt = 0
+    while True:
+        await bucket.acquire_async(priority)
+        await buckets["discord"].acquire_async(priority)
+        try:
+            return await send(*args, **kwargs)
+        except Exception as e:
+            retryable, retry_after = _discord_retry_after(e)
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+            delay = backoff(attempt, retry_after)
+            log.warning("discord send failed with %s, retrying in %.1fs", getattr(e, "status", e), delay)
+            metrics.inc("api_retries_total", api="discord", status=getattr(e, "status", ""))
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+log = logging.getLogger(__name__)
+
+MAX_SLEEP = 300  # Re-check the queue at least this often (seconds)
+RETRY_DELAY = 600  # Delay before retrying a review whose tally failed (seconds)
+MAX_ATTEMPTS = 10  # Failed tallies before a review is dropped
+
+
+@dataclass
+class PendingReview:
+    message_id: int
+    channel_id: int
+    filename: str
+    folder: str
+    author_id: int
+    author_name: str
+    deadline: float
+    payload: dict = field(default_factory=dict)
+    attempts: int = 0  # Failed tallies so far
+
+
+class ReviewScheduler:
+    """SQLite-backed queue of open review polls, drained by a single timer loop.
+
+    Reviews survive restarts: `run()` picks up whatever is still in the table
+    and tallies anything whose deadline passed while the bot was down. A
+    failed tally is retried after RETRY_DELAY, and handed to `drop` once it
+    has failed MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, path, tally, drop=None):
+        self.tally = tally
+        self.drop = drop
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._wake = None
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS pending_reviews (
+                    message_id INTEGER PRIMARY KEY,
+                    channel_id INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    author_id INTEGER NOT NULL,
+                    author_name TEXT,
+                    deadline REAL NOT NULL,
+                    payload TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(pending_reviews)")]
+            if "attempts" not in columns:
+                self._db.execute("ALTER TABLE pending_reviews ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS pending_reviews_deadline ON pending_reviews (deadline)")
+
+    def add(self, review):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pending_reviews (message_id, channel_id, filename, folder, author_id,"
+                " author_name, deadline, payload, attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (review.message_id, review.channel_id, review.filename, review.folder, review.author_id,
+                 review.author_name, review.deadline, json.dumps(review.payload), review.attempts)
+            )
+        if self._wake:
+            self._wake.set()
+
+    def remove(self, message_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM pending_reviews WHERE message_id = ?", (message_id,))
+
+    def postpone(self, message_id, deadline):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE pending_reviews SET deadline = ?, attempts = attempts + 1 WHERE message_id = ?", (deadline, message_id)
+            )
+
+    def save_payload(self, message_id, payload):
+        # Lets a tally record its progress, so a retry can skip the steps already done
+        with self._lock, self._db:
+            self._db.execute("UPDATE pending_reviews SET payload = ? WHERE message_id = ?", (json.dumps(payload), message_id))
+
+    def due(self, now=None, limit=100):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT message_id, channel_id, filename, folder, author_id, author_name, deadline, payload, attempts"
+                " FROM pending_reviews WHERE deadline <= ? ORDER BY deadline LIMIT ?",
+                (time.time() if now is None else now, limit)
+            ).fetchall()
+        return [PendingReview(*row[:7], payload=json.loads(row[7]), attempts=row[8]) for row in rows]
+
+    def next_deadline(self):
+        with self._lock:
+            row = self._db.execute("SELECT MIN(deadline) FROM pending_reviews").fetchone()
+        return row[0]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending_reviews").fetchone()[0]
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        log.info("Review scheduler resuming %d pending reviews", self.count())
+        while True:
+            for review in self.due():
+                try:
+                    await self.tally(review)
+                    self.remove(review.message_id)
+                except Exception as e:
+                    log.exception("Error tallying review for %s (message %s)", review.filename, review.message_id)
+                    if review.attempts + 1 < MAX_ATTEMPTS:
+                        self.postpone(review.message_id, time.time() + RETRY_DELAY)
+                        continue
+                    log.error("Dropping review for %s (message %s) after %d attempts",
+                              review.filename, review.message_id, MAX_ATTEMPTS)
+                    self.remove(review.message_id)
+                    if self.drop:
+                        self.drop(review)
+
+            next_deadline = self.next_deadline()
+            delay = MAX_SLEEP if next_deadline is None else min(max(next_deadline - time.time(), 0), MAX_SLEEP)
+            if delay <= 0:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
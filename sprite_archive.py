@@ -0,0 +1,86 @@
+import hashlib
+import io
+import os
+import posixpath
+import zipfile
+from dataclasses import dataclass
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+MAX_BATCH_SPRITES = int(os.environ.get("MAX_BATCH_SPRITES", "100"))
+MAX_SPRITE_BYTES = int(os.environ.get("MAX_SPRITE_BYTES", str(1024 * 1024)))
+READ_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class Sprite:
+    name: str
+    data: bytes
+    sha256: str
+
+
+def _read_member(archive, info, max_bytes):
+    # Hash while reading and stop at the limit, whatever the header claims the size is
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    with archive.open(info) as member:
+        while True:
+            chunk = member.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                return None, None
+            hasher.update(chunk)
+            chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+
+def read_sprite_archive(file_data, max_sprites=MAX_BATCH_SPRITES, max_bytes=MAX_SPRITE_BYTES):
+    """Validate and hash every PNG in a zip in one pass.
+
+    Returns (sprites, rejected) where rejected is a list of (name, reason).
+    Folders inside the archive are ignored, sprites are named by their file name.
+    """
+    sprites = []
+    rejected = []
+    seen = set()
+    if not hasattr(file_data, "seekable"):
+        # zipfile needs seekable(), which SpooledTemporaryFile only has from Python 3.11
+        file_data.seek(0)
+        file_data = io.BytesIO(file_data.read())
+    try:
+        archive = zipfile.ZipFile(file_data)
+    except zipfile.BadZipFile:
+        return [], [("archive", "not a valid zip file")]
+    with archive:
+        for info in archive.infolist():
+            name = posixpath.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            if not name.lower().endswith(".png"):
+                rejected.append((name, "not a .png file"))
+                continue
+            if name in seen:
+                rejected.append((name, "duplicate name in archive"))
+                continue
+            if len(sprites) >= max_sprites:
+                rejected.append((name, f"more than {max_sprites} sprites in one batch"))
+                continue
+            if info.file_size > max_bytes:
+                rejected.append((name, f"larger than {max_bytes // 1024} KiB"))
+                continue
+            try:
+                data, sha256 = _read_member(archive, info, max_bytes)
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                rejected.append((name, f"unreadable ({e})"))
+                continue
+            if data is None:
+                rejected.append((name, f"larger than {max_bytes // 1024} KiB"))
+                continue
+            if not data.startswith(PNG_SIGNATURE):
+                rejected.append((name, "not a PNG image"))
+                continue
+            seen.add(name)
+            sprites.append(Sprite(name, data, sha256))
+    return sprites, rejected
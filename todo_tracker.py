@@ -0,0 +1,93 @@
+import bisect
+import logging
+import threading
+from datetime import datetime
+
+from drive_index import FOLDER_MIME_TYPE
+
+log = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def normalize_cutoff(cutoff):
+    # Drive modifiedTime strings share one fixed-width UTC format, so once the
+    # cutoff is in that format a plain string comparison orders them correctly
+    return datetime.strptime(cutoff, DATE_FORMAT).strftime(DATE_FORMAT)[:-4] + "Z"
+
+
+class TodoTracker:
+    """Per-folder sorted set of textures not modified since that folder's cutoff.
+
+    Loaded from the Drive index and then updated incrementally through its
+    change listeners, so reading the list costs only the size of the result.
+    """
+
+    def __init__(self, drive_index, folders, cutoffs, default_cutoff):
+        self.drive_index = drive_index
+        self.folders = {root_id: folder for folder, root_id in folders.items()}  # root id -> folder name
+        self.cutoffs = {folder: normalize_cutoff(cutoffs.get(folder, default_cutoff)) for folder in folders}
+        self.ready = False
+        self._todo = {folder: [] for folder in folders}  # sorted (name, file id)
+        self._totals = {folder: 0 for folder in folders}
+        self._entries = {}  # file id -> (folder, name, is todo)
+        self._lock = threading.RLock()
+        drive_index.listeners.append(self._on_change)
+
+    def load(self):
+        with self._lock:
+            self._todo = {folder: [] for folder in self._todo}
+            self._totals = {folder: 0 for folder in self._totals}
+            self._entries.clear()
+            for root_id, folder in self.folders.items():
+                for file in self.drive_index.walk(root_id):
+                    self._add(folder, file)
+            self.ready = True
+        log.info("To-do tracker loaded: %d textures left", sum(len(todo) for todo in self._todo.values()))
+
+    def _on_change(self, old, new):
+        if not self.ready:
+            return
+        if new is None or new.get("mimeType") == FOLDER_MIME_TYPE:
+            if old is not None:
+                self._remove(old["id"])
+            return
+        folder = self.folders.get(self.drive_index.root_of(new["id"]))
+        with self._lock:
+            self._remove(new["id"])
+            if folder:
+                self._add(folder, new)
+
+    def _add(self, folder, file):
+        is_todo = file.get("modifiedTime", "") < self.cutoffs[folder]
+        self._entries[file["id"]] = (folder, file["name"], is_todo)
+        self._totals[folder] += 1
+        if is_todo:
+            bisect.insort(self._todo[folder], (file["name"], file["id"]))
+
+    def _remove(self, file_id):
+        with self._lock:
+            entry = self._entries.pop(file_id, None)
+            if entry is None:
+                return
+            folder, name, is_todo = entry
+            self._totals[folder] -= 1
+            if is_todo:
+                todo = self._todo[folder]
+                i = bisect.bisect_left(todo, (name, file_id))
+                if i < len(todo) and todo[i] == (name, file_id):
+                    del todo[i]
+
+    def progress(self, folder):
+        """Return (done, total) for a folder."""
+        with self._lock:
+            total = self._totals[folder]
+            return total - len(self._todo[folder]), total
+
+    def todo(self, folder, start=0, stop=None):
+        with self._lock:
+            return [name for name, _ in self._todo[folder][start:stop]]
+
+    def count(self, folder):
+        with self._lock:
+            return len(self._todo[folder])
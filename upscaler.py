@@ -0,0 +1,55 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+# Upscales are clamped so neither side exceeds this many pixels
+MAX_OUTPUT_SIDE = int(os.environ.get("MAX_UPSCALE_SIDE", "2048"))
+
+# PNG encoder settings: "fast" for Discord previews, "archival" for files we keep
+ENCODERS = {
+    "fast": {"compress_level": 1},
+    "archival": {"optimize": True},
+}
+
+
+def clamp_factor(width, height, upscale_factor, max_side=MAX_OUTPUT_SIDE):
+    # Largest integer factor up to the requested one that fits the size policy
+    return max(1, min(upscale_factor, max_side // max(width, height, 1)))
+
+
+def upscale_array(pixels, upscale_factor):
+    """Nearest-neighbour upscale of an (h, w) or (h, w, channels) array by an integer factor."""
+    if upscale_factor == 1:
+        return pixels
+    height, width = pixels.shape[:2]
+    rest = pixels.shape[2:]
+    # Broadcast every pixel into a factor x factor block as a strided view, then copy out once
+    blocks = np.broadcast_to(
+        pixels.reshape(height, 1, width, 1, *rest),
+        (height, upscale_factor, width, upscale_factor, *rest)
+    )
+    return blocks.reshape(height * upscale_factor, width * upscale_factor, *rest)
+
+
+def upscale(img, upscale_factor=5, max_side=MAX_OUTPUT_SIDE):
+    upscale_factor = clamp_factor(img.width, img.height, upscale_factor, max_side)
+    if img.mode == "P":
+        # Scale palette indices directly, keeps the output small and exact
+        upscaled_img = Image.fromarray(upscale_array(np.asarray(img), upscale_factor), "P")
+        palette_mode = img.palette.mode
+        upscaled_img.putpalette(img.getpalette(rawmode=palette_mode), rawmode=palette_mode)
+        if "transparency" in img.info:
+            upscaled_img.info["transparency"] = img.info["transparency"]
+        return upscaled_img
+    if img.mode not in ("RGBA", "RGB", "LA", "L"):
+        img = img.convert("RGBA")
+    return Image.fromarray(upscale_array(np.asarray(img), upscale_factor), img.mode)
+
+
+def encode_png(img, encoder="fast"):
+    image_data = io.BytesIO()
+    img.save(image_data, format="PNG", **ENCODERS[encoder])
+    image_data.seek(0)
+    return image_data
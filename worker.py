@@ -0,0 +1,280 @@
+"""Worker processes for the bot's image and Drive-heavy work.
+
+With WORKER_MODE on, the gateway puts jobs into a shared SQLite queue and
+awaits their results; any number of worker processes (on the same host or
+sharing the queue file) claim and run them. Run standalone with:
+
+    python worker.py [--queue jobs.db] [--processes N]
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from clients import ClientRegistry
+from download_manager import fetch_media
+from drive_crawler import crawl
+from drive_index import FOLDER_MIME_TYPE
+from executor import run_blocking
+from hash_index import fingerprint
+from rate_limit import INTERACTIVE, with_priority
+
+log = logging.getLogger(__name__)
+
+WORKER_QUEUE_PATH = os.environ.get("WORKER_QUEUE_PATH", "jobs.db")
+JOB_TIMEOUT = float(os.environ.get("WORKER_JOB_TIMEOUT", "120"))  # Seconds the gateway waits for a result
+POLL_INTERVAL = 0.05  # Idle workers check the queue this often (seconds)
+RESULT_POLL_MIN = 0.002
+RESULT_POLL_MAX = 0.05
+MAX_IDS_PER_QUERY = 500
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobFailed(Exception):
+    pass
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the gateway and the worker processes.
+
+    Arguments and results are pickled, only put the queue file somewhere the
+    bot alone can write to. Jobs are claimed lowest priority number first.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        self._waiting = {}  # job id -> future of a gateway caller
+        self._poller = None
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    args BLOB NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    result BLOB,
+                    error TEXT,
+                    worker TEXT,
+                    created REAL NOT NULL,
+                    started REAL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, id)")
+
+    def put(self, kind, args, priority=INTERACTIVE):
+        with self._lock:
+            return self._db.execute(
+                "INSERT INTO jobs (kind, args, priority, status, created) VALUES (?, ?, ?, ?, ?)",
+                (kind, pickle.dumps(args), priority, QUEUED, time.time())
+            ).lastrowid
+
+    def claim(self, worker):
+        """Take the next job, returning (id, kind, args, priority) or None when there's nothing to do."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, kind, args, priority FROM jobs WHERE status = ? ORDER BY priority, id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, started = ? WHERE id = ?", (RUNNING, worker, time.time(), row[0])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], row[1], pickle.loads(row[2]), row[3]
+
+    def finish(self, job_id, result=None, error=None):
+        # A no-op if the gateway gave up on the job and deleted it
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ? WHERE id = ?",
+                (FAILED if error else DONE, None if error else pickle.dumps(result), error, job_id)
+            )
+
+    def take_finished(self, job_ids):
+        """{id: result or JobFailed} for the given jobs that are done, removing them from the queue."""
+        finished = {}
+        with self._lock:
+            for start in range(0, len(job_ids), MAX_IDS_PER_QUERY):
+                chunk = job_ids[start:start + MAX_IDS_PER_QUERY]
+                marks = ", ".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT id, status, result, error FROM jobs WHERE id IN ({marks}) AND status IN (?, ?)",
+                    (*chunk, DONE, FAILED)
+                ).fetchall()
+                if rows:
+                    self._db.execute(f"DELETE FROM jobs WHERE id IN ({', '.join('?' * len(rows))})", [row[0] for row in rows])
+                for job_id, status, result, error in rows:
+                    finished[job_id] = JobFailed(error) if status == FAILED else pickle.loads(result)
+        return finished
+
+    def delete(self, job_id):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def clear(self):
+        # Nobody awaits jobs left over from before a gateway restart
+        with self._lock:
+            self._db.execute("DELETE FROM jobs")
+
+    @property
+    def waiting(self):
+        return len(self._waiting)
+
+    async def submit(self, kind, *args, priority=INTERACTIVE, timeout=JOB_TIMEOUT):
+        """Queue a job and wait for a worker to finish it, raising JobFailed if it raised.
+
+        SQLite calls run on the blocking pool, a queue file locked by the
+        workers never stalls the event loop.
+        """
+        job_id = await run_blocking("jobs", self.put, kind, args, priority)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[job_id] = future
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise JobFailed(f"{kind} job timed out after {timeout:.0f}s") from None
+        finally:
+            if self._waiting.pop(job_id, None) is not None:
+                await asyncio.shield(run_blocking("jobs", self.delete, job_id))
+
+    async def _poll(self):
+        # One query per round collects every finished job this gateway is waiting on
+        delay = RESULT_POLL_MIN
+        while self._waiting:
+            try:
+                finished = await run_blocking("jobs", self.take_finished, list(self._waiting))
+            except Exception:
+                log.exception("Error polling the job queue")
+                finished = {}
+            for job_id, result in finished.items():
+                future = self._waiting.pop(job_id, None)
+                if future is None or future.done():
+                    continue
+                if isinstance(result, JobFailed):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            delay = RESULT_POLL_MIN if finished else min(delay * 2, RESULT_POLL_MAX)
+            await asyncio.sleep(delay)
+
+
+# Jobs run in worker processes, each with its own Drive clients
+clients = ClientRegistry()
+
+
+def download(file):
+    return fetch_media(clients.drive(), file["id"], file.get("size"))
+
+
+def upscale_job(file, upscale_factor, encoder):
+    from PIL import Image
+
+    import upscaler
+
+    with Image.open(io.BytesIO(download(file))) as img:
+        return upscaler.encode_png(upscaler.upscale(img, upscale_factor), encoder).getvalue()
+
+
+def preview_job(current_file, mcmeta_file, new_data):
+    import preview
+
+    mcmeta = download(mcmeta_file) if mcmeta_file else None
+    output, _ = preview.compare(download(current_file), new_data, mcmeta=mcmeta)
+    return output.getvalue()
+
+
+def contact_sheet_job(pairs):
+    import preview
+
+    return preview.contact_sheet(pairs).getvalue()
+
+
+def list_files_job(folder_id):
+    return [file for file in crawl(clients.drive(), folder_id) if file.get("mimeType") != FOLDER_MIME_TYPE]
+
+
+JOBS = {
+    "upscale": upscale_job,
+    "preview": preview_job,
+    "contact_sheet": contact_sheet_job,
+    "fingerprint": fingerprint,
+    "list_files": list_files_job,
+}
+
+
+def work(queue_path, parent=None):
+    """Run jobs until the parent process (if given) goes away."""
+    queue = JobQueue(queue_path)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    log.info("Worker %s taking jobs from %s", name, queue_path)
+    while parent is None or os.getppid() == parent:
+        job = queue.claim(name)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        job_id, kind, args, priority = job
+        started = time.perf_counter()
+        try:
+            result = with_priority(priority, JOBS[kind])(*args)
+        except Exception as e:
+            log.exception("Job %d (%s) failed", job_id, kind)
+            queue.finish(job_id, error=f"{type(e).__name__}: {e}")
+            continue
+        queue.finish(job_id, result=result)
+        log.debug("Job %d (%s) done in %.1f ms", job_id, kind, (time.perf_counter() - started) * 1000)
+
+
+def start_workers(queue_path, count):
+    """Spawn `count` worker processes that exit along with this one."""
+    return [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--queue", queue_path, "--parent", str(os.getpid())])
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run jobs queued by the bot in WORKER_MODE.")
+    parser.add_argument("--queue", default=WORKER_QUEUE_PATH)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--parent", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    if args.processes > 1:
+        for process in start_workers(args.queue, args.processes):
+            process.wait()
+        return
+    try:
+        work(args.queue, args.parent)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()